@@ -0,0 +1,84 @@
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ANALYTICS_CACHE_DIR = "analytics_cache"
+
+# Upper bound on the points any scatter plot sends to the browser
+MAX_SCATTER_POINTS = 2000
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, used as the dataset version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frame_hash(df):
+    """SHA-256 of a DataFrame's column names and values, for catalogs not backed by one file."""
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def downsample(frame, max_points=MAX_SCATTER_POINTS, seed=0):
+    """Uniform random sample of at most `max_points` rows, kept in catalog order."""
+    if len(frame) <= max_points:
+        return frame.reset_index(drop=True)
+    return frame.sample(n=max_points, random_state=seed).sort_index().reset_index(drop=True)
+
+
+def bin_scatter(x, y, bins=50):
+    """2D histogram of a scatter: one row per non-empty cell with its centre and count."""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    x_cells, y_cells = np.nonzero(counts)
+    return pd.DataFrame({
+        "x": (x_edges[x_cells] + x_edges[x_cells + 1]) / 2,
+        "y": (y_edges[y_cells] + y_edges[y_cells + 1]) / 2,
+        "count": counts[x_cells, y_cells].astype(np.int64),
+    })
+
+
+def compute_aggregates(df):
+    """Everything the Data Analysis pages plot, computed in one pass over the catalog."""
+    genre_counts = df['Genre'].value_counts()
+    author_stats = df.groupby('Author', observed=True).agg(
+        average_rating=('Rating', 'mean'),
+        average_reviews=('Number of Reviews', 'mean')
+    ).reset_index()
+    rating_counts, rating_edges = np.histogram(df['Rating'], bins=20)
+    reviews = df[['Number of Reviews', 'Rating']]
+
+    return {
+        "genre_counts": genre_counts,
+        "top_genres": genre_counts[genre_counts.index != 'Unknown'].head(10),
+        "highest_rated_by_author": df.groupby('Author', observed=True)['Rating'].max().sort_values(ascending=False).head(10),
+        "author_stats": downsample(author_stats),
+        "author_stats_binned": bin_scatter(author_stats['average_reviews'], author_stats['average_rating']),
+        "rating_histogram": pd.DataFrame({
+            "Rating": (rating_edges[:-1] + rating_edges[1:]) / 2,
+            "Number of Books": rating_counts,
+        }),
+        "review_scatter": downsample(reviews),
+        "review_scatter_binned": bin_scatter(reviews['Number of Reviews'], reviews['Rating']),
+    }
+
+
+def load_aggregates(df, version, cache_dir=ANALYTICS_CACHE_DIR):
+    """Aggregates for dataset `version`, read from `cache_dir` or computed and persisted there."""
+    path = os.path.join(cache_dir, f"{version}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+    aggregates = compute_aggregates(df)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(aggregates, tmp_path)
+    os.replace(tmp_path, path)
+    return aggregates
@@ -0,0 +1,249 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from analytics import file_hash
+from neighbor_index import DEFAULT_K, NeighborIndex, select_top_n
+from similarity import CATALOG_PATH, HybridScorer, normalize_rows
+
+ANN_INDEX_PATH = "ann_index.npz"
+
+# ANN candidates re-ranked by the exact hybrid score per query at serving time
+ANN_POOL = 200
+
+
+class ExactIndex:
+    """Brute-force cosine search over normalised embeddings; the reference for recall."""
+
+    def __init__(self, vectors):
+        self.vectors = normalize_rows(vectors)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, queries, top_n, exclude=None):
+        return select_top_n(normalize_rows(queries) @ self.vectors.T, top_n, exclude=exclude)
+
+    def search_rows(self, rows, top_n):
+        rows = np.atleast_1d(rows)
+        return self.search(self.vectors[rows], top_n, exclude=rows)
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over normalised embeddings, pure NumPy.
+
+    Vectors are clustered with spherical k-means into `n_lists` cells; a query
+    only scores the vectors of its `nprobe` closest cells. Larger `nprobe`
+    raises recall and latency; `nprobe == n_lists` is exact search. Like
+    `NeighborIndex`, `version` records the catalog the index was built for.
+    """
+
+    def __init__(self, centroids, offsets, rows, vectors, nprobe=8, version=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        self.nprobe = nprobe
+        self.version = version
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, n_iter=10, nprobe=8, seed=0, block_size=8192):
+        vectors = normalize_rows(vectors)
+        n = vectors.shape[0]
+        n_lists = min(n_lists or max(1, int(4 * np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignment = cls._assign(vectors, centroids, block_size)
+            members = sp.csr_matrix((np.ones(n, dtype=np.float32), (assignment, np.arange(n))), shape=(n_lists, n))
+            sums = np.asarray(members @ vectors)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Re-seed empty cells with random vectors so every list stays in use
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()), replace=False)]
+            centroids = normalize_rows(sums)
+
+        return cls._from_assignment(centroids, cls._assign(vectors, centroids, block_size), vectors, nprobe)
+
+    @classmethod
+    def _from_assignment(cls, centroids, assignment, vectors, nprobe, version=None):
+        rows = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=len(centroids)))
+        return cls(centroids, offsets, rows, vectors, nprobe=nprobe, version=version)
+
+    def add(self, vectors, block_size=8192):
+        """New index with `vectors` appended as the next rows, each put in its closest existing cell.
+
+        Centroids are kept, so appending costs O(M * n_lists * d) instead of
+        re-clustering; rebuild after large appends to rebalance the cells.
+        """
+        vectors = normalize_rows(vectors)
+        assignment = np.empty(len(self), dtype=np.int64)
+        assignment[self.rows] = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+        assignment = np.concatenate([assignment, self._assign(vectors, self.centroids, block_size)])
+        return self._from_assignment(self.centroids, assignment, np.concatenate([self.vectors, vectors]),
+                                     self.nprobe)
+
+    @staticmethod
+    def _assign(vectors, centroids, block_size):
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], block_size):
+            block = vectors[start:start + block_size] @ centroids.T
+            assignment[start:start + block_size] = block.argmax(axis=1)
+        return assignment
+
+    def candidates(self, query, nprobe=None):
+        """Catalog rows in the `nprobe` cells closest to one normalised query."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[cell]:self.offsets[cell + 1]] for cell in cells])
+
+    def search(self, queries, top_n, exclude=None, nprobe=None):
+        """(queries x top_n) approximate neighbors and cosine scores; -1 pads short candidate sets."""
+        queries = normalize_rows(np.atleast_2d(queries))
+        indices = np.full((len(queries), top_n), -1, dtype=np.int32)
+        scores = np.full((len(queries), top_n), -np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            candidates = self.candidates(query, nprobe)
+            if exclude is not None:
+                candidates = candidates[candidates != exclude[i]]
+            if len(candidates) == 0:
+                continue
+            found, found_scores = select_top_n((self.vectors[candidates] @ query)[None, :], top_n)
+            indices[i, :found.shape[1]] = candidates[found[0]]
+            scores[i, :found.shape[1]] = found_scores[0]
+        return indices, scores
+
+    def search_rows(self, rows, top_n, nprobe=None):
+        rows = np.atleast_1d(rows)
+        return self.search(self.vectors[rows], top_n, exclude=rows, nprobe=nprobe)
+
+    def save(self, path=ANN_INDEX_PATH):
+        extra = {} if self.version is None else {"version": self.version}
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+                 vectors=self.vectors, nprobe=self.nprobe, **extra)
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with np.load(path) as data:
+            version = str(data["version"]) if "version" in data else None
+            return cls(data["centroids"], data["offsets"], data["rows"], data["vectors"], nprobe=int(data["nprobe"]),
+                       version=version)
+
+
+# ---------- Re-ranking ----------
+def rerank_rows(ann, scorer, rows, top_n, pool=100, nprobe=None, known=None):
+    """Top `top_n` by exact hybrid score among each row's `pool` ANN candidates.
+
+    `known` optionally adds (rows x K) candidates per row, such as the stored
+    exact neighbor lists, which the embedding-only ANN search can miss when
+    the TF-IDF half dominates the hybrid score.
+    """
+    rows = np.atleast_1d(rows)
+    candidates, _ = ann.search_rows(rows, pool, nprobe=nprobe)
+    if known is not None:
+        candidates = np.concatenate([np.asarray(known, dtype=np.int32), candidates], axis=1)
+    indices = np.full((len(rows), top_n), -1, dtype=np.int32)
+    scores = np.full((len(rows), top_n), -np.inf, dtype=np.float32)
+    for i, row in enumerate(rows):
+        pool_rows = np.unique(candidates[i][candidates[i] >= 0])
+        exact = scorer.score_candidates(row, pool_rows)
+        found, found_scores = select_top_n(exact[None, :], top_n)
+        indices[i, :found.shape[1]] = pool_rows[found[0]]
+        scores[i, :found.shape[1]] = found_scores[0]
+    return indices, scores
+
+
+def rerank_vectors(ann, scorer, tfidf, embeddings, top_n, pool=ANN_POOL, nprobe=None, tfidf_weight=None):
+    """Like `rerank_rows` for out-of-catalog queries given their TF-IDF rows and normalised embeddings."""
+    candidates, _ = ann.search(embeddings, pool, nprobe=nprobe)
+    indices = np.full((len(candidates), top_n), -1, dtype=np.int32)
+    scores = np.full((len(candidates), top_n), -np.inf, dtype=np.float32)
+    for i in range(len(candidates)):
+        pool_rows = candidates[i][candidates[i] >= 0]
+        if len(pool_rows) == 0:
+            continue
+        exact = scorer.score_vector_candidates(tfidf[i], embeddings[i], pool_rows, tfidf_weight)
+        found, found_scores = select_top_n(exact[None, :], top_n)
+        indices[i, :found.shape[1]] = pool_rows[found[0]]
+        scores[i, :found.shape[1]] = found_scores[0]
+    return indices, scores
+
+
+def build_neighbor_index_ann(ann, scorer, k=DEFAULT_K, pool=200, nprobe=None):
+    """`NeighborIndex` from ANN candidates re-ranked by the exact hybrid score, O(N * pool * d)."""
+    indices, scores = rerank_rows(ann, scorer, np.arange(len(ann)), k, pool=pool, nprobe=nprobe)
+    return NeighborIndex(indices, scores, scorer=scorer)
+
+
+# ---------- Recall ----------
+def recall_at_k(approx, exact):
+    """Mean fraction of each row's exact top-K that the approximate top-K also returned."""
+    k = exact.shape[1]
+    hits = [len(np.intersect1d(a[a >= 0], e)) for a, e in zip(approx, exact)]
+    return float(np.mean(hits)) / k
+
+
+def measure_recall(ann, k=10, nprobes=(1, 2, 4, 8, 16, 32), sample=500, seed=0):
+    """Recall@k and per-query latency of `ann` against exact search for each `nprobe`."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(ann), min(sample, len(ann)), replace=False)
+    exact, _ = ExactIndex(ann.vectors).search_rows(rows, k)
+    results = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        approx, _ = ann.search_rows(rows, k, nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "nprobe": nprobe,
+            "recall@k": recall_at_k(approx, exact),
+            "ms_per_query": 1000 * elapsed / len(rows),
+        })
+    return pd.DataFrame(results)
+
+
+def measure_rerank_recall(ann, scorer, k=10, pools=(50, 100, 200), nprobe=None, sample=500, seed=0):
+    """Recall@k of ANN + exact hybrid re-ranking against the exact hybrid top-k, per pool size."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(ann), min(sample, len(ann)), replace=False)
+    exact, _ = select_top_n(scorer(rows), k, exclude=rows)
+    results = []
+    for pool in pools:
+        start = time.perf_counter()
+        approx, _ = rerank_rows(ann, scorer, rows, k, pool=pool, nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        results.append({
+            "pool": pool,
+            "recall@k": recall_at_k(approx, exact),
+            "ms_per_query": 1000 * elapsed / len(rows),
+        })
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an IVF index over the book embeddings and measure its recall.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--out", default=ANN_INDEX_PATH)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    scorer = HybridScorer.from_catalog(pd.read_csv(args.catalog))
+    ann = IVFIndex.build(scorer.embeddings, n_lists=args.n_lists, nprobe=args.nprobe)
+    ann.version = file_hash(args.catalog)
+    ann.save(args.out)
+    print(f"Saved IVF index with {ann.n_lists} lists over {len(ann)} books to {args.out}")
+    print(measure_recall(ann, k=args.k).to_string(index=False))
+    print(measure_rerank_recall(ann, scorer, k=args.k).to_string(index=False))
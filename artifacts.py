@@ -0,0 +1,262 @@
+import argparse
+import hashlib
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from analytics import frame_hash
+from ann_index import ANN_INDEX_PATH, IVFIndex
+from catalog_store import TEXT_ONLY_COLUMNS, CatalogStore, write_store
+from embedding_store import DTYPES, EMBEDDING_STORE_PATH, QuantizedEmbeddings
+from neighbor_index import DEFAULT_K, NeighborIndex, build_neighbor_index, select_top_n
+from similarity import (
+    CATALOG_PATH,
+    TFIDF_WEIGHT,
+    VECTORIZER_PATH,
+    HybridScorer,
+    book_text,
+    lazy_scorer,
+    load_encoder,
+    normalize_rows,
+)
+
+# Versioned artifact layout:
+#   artifacts/CURRENT          name of the live version, swapped atomically
+#   artifacts/v0001/catalog    CatalogStore
+#   artifacts/v0001/neighbor_index.npz, tfidf.npz, embeddings.npy
+#   artifacts/v0001/embedding_store  optional QuantizedEmbeddings served instead of embeddings.npy
+#   artifacts/v0001/ann_index.npz    optional IVFIndex over the embeddings
+ARTIFACTS_DIR = "artifacts"
+CURRENT_FILE = "CURRENT"
+
+
+# ---------- Versions ----------
+def current_version(root=ARTIFACTS_DIR):
+    """Name of the live version, or None when nothing has been published."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as handle:
+            return handle.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_path(root, version):
+    return os.path.join(root, version)
+
+
+def next_version(root=ARTIFACTS_DIR):
+    existing = os.listdir(root) if os.path.isdir(root) else []
+    existing = [name for name in existing if name.startswith("v") and name[1:].isdigit()]
+    return f"v{max((int(name[1:]) for name in existing), default=0) + 1:04d}"
+
+
+def content_hash(df, neighbor_index):
+    """Hash of a version's catalog and neighbor lists, the key for analytics and report caches.
+
+    Version names are reused after a re-init, so caches must not be keyed on them.
+    """
+    digest = hashlib.sha256(frame_hash(df).encode())
+    digest.update(np.ascontiguousarray(neighbor_index.indices).tobytes())
+    digest.update(np.ascontiguousarray(neighbor_index.scores).tobytes())
+    return digest.hexdigest()
+
+
+def version_hash(root, version):
+    """Content hash recorded for `version`, or None when nothing has been published."""
+    if version is None:
+        return None
+    return CatalogStore(os.path.join(version_path(root, version), "catalog")).content_hash
+
+
+def publish(root, df, tfidf, embeddings, neighbor_index, embedding_dtype=None, ann=None):
+    """Write a complete new version, then point CURRENT at it in one atomic rename.
+
+    With `embedding_dtype` ("int8" or "float16") a quantized copy of the
+    embeddings is written too and served in their place; the float32 file is
+    kept as the source for later appends. `ann` is an optional `IVFIndex`
+    saved with the version.
+    """
+    os.makedirs(root, exist_ok=True)
+    version = next_version(root)
+    tmp_dir = os.path.join(root, f".{version}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    write_store(df, os.path.join(tmp_dir, "catalog"), version=version,
+                content_hash=content_hash(df, neighbor_index))
+    sp.save_npz(os.path.join(tmp_dir, "tfidf.npz"), tfidf)
+    np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+    if embedding_dtype is not None:
+        QuantizedEmbeddings.quantize(embeddings, embedding_dtype).save(os.path.join(tmp_dir, EMBEDDING_STORE_PATH))
+    neighbor_index.save(os.path.join(tmp_dir, "neighbor_index.npz"))
+    if ann is not None:
+        ann.version = version
+        ann.save(os.path.join(tmp_dir, ANN_INDEX_PATH))
+    os.replace(tmp_dir, version_path(root, version))
+
+    pointer = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer, "w") as handle:
+        handle.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+    return version
+
+
+def embedding_dtype(root, version):
+    """Dtype of `version`'s quantized embedding store, or None when it only has float32 embeddings."""
+    store_path = os.path.join(version_path(root, version), EMBEDDING_STORE_PATH)
+    return str(QuantizedEmbeddings.load(store_path).dtype) if os.path.isdir(store_path) else None
+
+
+def version_embeddings(root, version, quantized=True):
+    """`version`'s memory-mapped embeddings: its quantized store unless `quantized=False`, else embeddings.npy."""
+    path = version_path(root, version)
+    if quantized and embedding_dtype(root, version) is not None:
+        return QuantizedEmbeddings.load(os.path.join(path, EMBEDDING_STORE_PATH))
+    return np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+
+
+def load_scorer(root, version, tfidf_weight=TFIDF_WEIGHT, vectorizer_path=VECTORIZER_PATH, quantized=True):
+    """Scorer over `version`'s memory-mapped artifacts (see `version_embeddings`)."""
+    tfidf = sp.load_npz(os.path.join(version_path(root, version), "tfidf.npz")).tocsr()
+    embeddings = version_embeddings(root, version, quantized)
+    return HybridScorer(joblib.load(vectorizer_path), tfidf, embeddings, tfidf_weight=tfidf_weight)
+
+
+def load_ann(root, version):
+    """`version`'s IVF index, or None when it was published without one."""
+    path = os.path.join(version_path(root, version), ANN_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    ann = IVFIndex.load(path)
+    if ann.version not in (None, version):
+        raise ValueError(f"{path} was built for {ann.version}, not {version}.")
+    return ann
+
+
+def load_version(root=ARTIFACTS_DIR, version=None, exclude=TEXT_ONLY_COLUMNS):
+    """(DataFrame, NeighborIndex, version) for `version` (default: the live one).
+
+    The index fallback scorer is only loaded from disk when first needed. The
+    serving frame leaves out `exclude`; pass `exclude=()` for the full catalog.
+    """
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No published version in {root!r}; run `python artifacts.py init` first.")
+    path = version_path(root, version)
+    df = CatalogStore(os.path.join(path, "catalog")).to_frame(exclude=exclude)
+    scorer = lazy_scorer(df, loader=lambda: load_scorer(root, version))
+    neighbor_index = NeighborIndex.load(os.path.join(path, "neighbor_index.npz"), scorer=scorer)
+    return df, neighbor_index, version
+
+
+# ---------- Full and Incremental Builds ----------
+def init_artifacts(root=ARTIFACTS_DIR, csv_path=CATALOG_PATH, k=DEFAULT_K, embedding_dtype=None, ann=False):
+    """Publish the first version with a full build from the CSV and models/ (plus an IVF index with `ann`)."""
+    df = pd.read_csv(csv_path)
+    scorer = HybridScorer.from_catalog(df)
+    neighbor_index = build_neighbor_index(scorer, k=k)
+    return publish(root, df, scorer.tfidf, scorer.embeddings, neighbor_index, embedding_dtype=embedding_dtype,
+                   ann=IVFIndex.build(scorer.embeddings) if ann else None)
+
+
+def merge_neighbors(indices, scores, new_indices, new_scores):
+    """Keep the best K of each row's stored neighbors plus its scores against new books."""
+    k = indices.shape[1]
+    merged_indices = np.concatenate([indices, new_indices], axis=1)
+    merged_scores = np.concatenate([scores, new_scores], axis=1)
+    top, top_scores = select_top_n(merged_scores, k)
+    return np.take_along_axis(merged_indices, top, axis=1).astype(np.int32), top_scores
+
+
+def append_books(new_books, root=ARTIFACTS_DIR, new_embeddings=None, encoder=None, max_block_elements=1 << 24):
+    """Add `new_books` to the live version and publish the result as a new version.
+
+    Only the new rows are vectorised and embedded. Their own neighbor lists
+    come from scoring them against the whole catalog. Existing books are
+    scored against the new ones in row blocks, and only rows where a new book
+    beats their current K-th neighbor are merged. Time grows with M * N,
+    never N * N; no score block exceeds `max_block_elements` floats, so
+    working memory stays bounded beyond the N x K output itself. A version's
+    IVF index is carried over with the new books added to its cells.
+    """
+    df, neighbor_index, version = load_version(root, exclude=())
+    missing = [column for column in df.columns if column not in new_books.columns]
+    if missing:
+        raise ValueError(f"New books are missing columns: {missing}")
+    new_books = new_books[list(df.columns)].reset_index(drop=True)
+
+    old = load_scorer(root, version, quantized=False)
+    new_text = book_text(new_books)
+    new_tfidf = old.vectorizer.transform(new_text).astype(np.float32).tocsr()
+    if new_embeddings is None:
+        encoder = encoder or load_encoder()
+        if encoder is None:
+            raise ValueError("Pass new_embeddings or install sentence-transformers to embed new books.")
+        new_embeddings = encoder(new_text)
+    new_embeddings = normalize_rows(new_embeddings)
+    if new_embeddings.shape != (len(new_books), old.embeddings.shape[1]):
+        raise ValueError(f"Expected embeddings of shape {(len(new_books), old.embeddings.shape[1])}, got {new_embeddings.shape}")
+
+    n, m = len(df), len(new_books)
+    scorer = HybridScorer(
+        old.vectorizer,
+        sp.vstack([old.tfidf, new_tfidf]).tocsr(),
+        np.concatenate([old.embeddings, new_embeddings]),
+        tfidf_weight=old.tfidf_weight,
+    )
+    k = neighbor_index.k
+    indices = np.empty((n + m, k), dtype=np.int32)
+    scores = np.empty((n + m, k), dtype=np.float32)
+    indices[:n], scores[:n] = neighbor_index.indices, neighbor_index.scores
+    new_rows = np.arange(n, n + m)
+
+    # New books against everything: (rows x N + M) blocks
+    step = max(1, max_block_elements // (n + m))
+    for start in range(0, m, step):
+        rows = new_rows[start:start + step]
+        indices[rows], scores[rows] = select_top_n(scorer(rows), k, exclude=rows)
+
+    # Existing books against the new ones: (rows x M) blocks, patching only the affected rows
+    step = max(1, max_block_elements // m)
+    for start in range(0, n, step):
+        rows = np.arange(start, min(start + step, n))
+        block = scorer.score_block(rows, new_rows)
+        affected = block.max(axis=1) > scores[rows, -1]
+        if not affected.any():
+            continue
+        rows, block = rows[affected], block[affected]
+        top, top_scores = select_top_n(block, k)
+        indices[rows], scores[rows] = merge_neighbors(indices[rows], scores[rows], new_rows[top], top_scores)
+
+    combined = pd.concat([df, new_books], ignore_index=True)
+    ann = load_ann(root, version)
+    return publish(root, combined, scorer.tfidf, scorer.embeddings, NeighborIndex(indices, scores),
+                   embedding_dtype=embedding_dtype(root, version), ann=None if ann is None else ann.add(new_embeddings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish versioned catalog + similarity artifacts.")
+    parser.add_argument("--root", default=ARTIFACTS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    init = commands.add_parser("init", help="Full build of the first version from the CSV.")
+    init.add_argument("--catalog", default=CATALOG_PATH)
+    init.add_argument("--k", type=int, default=DEFAULT_K)
+    init.add_argument("--embedding-dtype", choices=sorted(DTYPES), default=None,
+                      help="Also store quantized embeddings and serve them instead of float32")
+    init.add_argument("--ann", action="store_true", help="Also build an IVF index (kept by later appends)")
+    append = commands.add_parser("append", help="Add new books to the live version.")
+    append.add_argument("books", help="CSV with the same columns as the catalog")
+    append.add_argument("--embeddings", help=".npy embeddings for the new books (default: encode them)")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        version = init_artifacts(args.root, args.catalog, k=args.k, embedding_dtype=args.embedding_dtype,
+                                 ann=args.ann)
+    else:
+        embeddings = np.load(args.embeddings) if args.embeddings else None
+        version = append_books(pd.read_csv(args.books), args.root, new_embeddings=embeddings)
+    print(f"Published {version} in {args.root}")
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import shutil
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from analytics import file_hash
+from similarity import CATALOG_PATH
+
+# Store layout (one directory per CSV version, so a rebuild never touches a store workers have mapped):
+#   catalog_store/CURRENT            name of the most recently built version, swapped atomically
+#   catalog_store/<csv hash prefix>  CatalogStore
+CATALOG_STORE_PATH = "catalog_store"
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+# Only read when text features are recomputed (see similarity.book_text), never while serving
+TEXT_ONLY_COLUMNS = ["Description"]
+
+
+def _slug(column):
+    return column.lower().replace(" ", "_")
+
+
+class DictionaryColumn:
+    """String column stored as int32 codes into a pool of distinct UTF-8 values (-1 = missing).
+
+    Codes and pool bytes are memory-mapped; strings are only decoded on request.
+    """
+
+    def __init__(self, path, column):
+        self.path = path
+        self.slug = _slug(column)
+
+    def _file(self, suffix):
+        return os.path.join(self.path, f"{self.slug}.{suffix}")
+
+    @cached_property
+    def codes(self):
+        return np.load(self._file("codes.npy"), mmap_mode="r")
+
+    @cached_property
+    def offsets(self):
+        return np.load(self._file("offsets.npy"), mmap_mode="r")
+
+    @cached_property
+    def pool(self):
+        return np.memmap(self._file("pool.bin"), dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.codes)
+
+    def value(self, code):
+        return bytes(self.pool[self.offsets[code]:self.offsets[code + 1]]).decode("utf-8")
+
+    @cached_property
+    def categories(self):
+        raw = self.pool.tobytes()
+        bounds = self.offsets.tolist()
+        return [raw[start:stop].decode("utf-8") for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def decode(self, rows):
+        """Strings for `rows` only, None where missing."""
+        return [None if code < 0 else self.value(code) for code in self.codes[rows]]
+
+    def to_categorical(self):
+        return pd.Categorical.from_codes(np.asarray(self.codes), categories=pd.Index(self.categories, dtype=object))
+
+
+class CatalogStore:
+    """Lazily opened, memory-mapped columnar copy of the catalog CSV.
+
+    Numeric columns are typed `.npy` arrays; every string column (Genre, Author,
+    Book Name and the heavily repeated Description) is dictionary-encoded.
+    Workers on one host map the same files and so share their pages.
+    """
+
+    def __init__(self, path=CATALOG_STORE_PATH):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as handle:
+            self.meta = json.load(handle)
+        self.columns = [column["name"] for column in self.meta["columns"]]
+        self.kinds = {column["name"]: column["kind"] for column in self.meta["columns"]}
+        self._columns = {}
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    @property
+    def content_hash(self):
+        """Hash of what was published; unlike a reusable version name it changes with the content."""
+        return self.meta.get("content_hash", self.version)
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def column(self, name):
+        """A memory-mapped numeric array or a `DictionaryColumn`, opened on first use."""
+        if name not in self._columns:
+            if self.kinds[name] == "numeric":
+                self._columns[name] = np.load(os.path.join(self.path, f"{_slug(name)}.npy"), mmap_mode="r")
+            else:
+                self._columns[name] = DictionaryColumn(self.path, name)
+        return self._columns[name]
+
+    def to_frame(self, columns=None, exclude=()):
+        """DataFrame view: numeric columns wrap the mapped arrays, strings become categoricals.
+
+        String columns are decoded into per-process categories, so pass
+        `exclude` for columns the caller never reads.
+        """
+        data = {}
+        for name in columns or [column for column in self.columns if column not in exclude]:
+            column = self.column(name)
+            data[name] = column if self.kinds[name] == "numeric" else column.to_categorical()
+        return pd.DataFrame(data, copy=False)
+
+
+def store_dir(root, version):
+    return os.path.join(root, version[:16])
+
+
+def current_store(root=CATALOG_STORE_PATH):
+    """The most recently built `CatalogStore` under `root`, or None."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as handle:
+            name = handle.read().strip()
+    except FileNotFoundError:
+        return None
+    return CatalogStore(os.path.join(root, name)) if name else None
+
+
+def build_store(csv_path=CATALOG_PATH, root=CATALOG_STORE_PATH, version=None):
+    """Store for the CSV's current content under `root`, built if needed, and point CURRENT at it.
+
+    Stores of other versions are left in place, since running workers may
+    still have them mapped; `prune_stores` removes them.
+    """
+    version = version or file_hash(csv_path)
+    path = store_dir(root, version)
+    if os.path.exists(os.path.join(path, META_FILE)):
+        store = CatalogStore(path)
+    else:
+        os.makedirs(root, exist_ok=True)
+        store = write_store(pd.read_csv(csv_path), path, version=version)
+    pointer = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer, "w") as handle:
+        handle.write(os.path.basename(path))
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+    return store
+
+
+def prune_stores(root=CATALOG_STORE_PATH):
+    """Delete every store under `root` except the current one; run once no worker serves the old ones."""
+    current = current_store(root)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and (current is None or os.path.abspath(path) != os.path.abspath(current.path)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def write_store(df, out_dir, version, content_hash=None):
+    """Write `df` as a `CatalogStore` directory tagged with `version` (and `content_hash`, if given)."""
+    tmp_dir = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for name in df.columns:
+        slug = _slug(name)
+        if pd.api.types.is_numeric_dtype(df[name]):
+            np.save(os.path.join(tmp_dir, f"{slug}.npy"), df[name].to_numpy())
+            columns.append({"name": name, "kind": "numeric"})
+            continue
+        codes, uniques = pd.factorize(df[name])
+        encoded = [str(value).encode("utf-8") for value in uniques]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        np.save(os.path.join(tmp_dir, f"{slug}.codes.npy"), codes.astype(np.int32))
+        np.save(os.path.join(tmp_dir, f"{slug}.offsets.npy"), offsets)
+        with open(os.path.join(tmp_dir, f"{slug}.pool.bin"), "wb") as handle:
+            handle.write(b"".join(encoded))
+        columns.append({"name": name, "kind": "dictionary"})
+
+    meta = {"version": version, "rows": len(df), "columns": columns}
+    if content_hash is not None:
+        meta["content_hash"] = content_hash
+    with open(os.path.join(tmp_dir, META_FILE), "w") as handle:
+        json.dump(meta, handle, indent=2)
+
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        # Another process published this directory first; its store is complete, so keep it
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, META_FILE)):
+            raise
+    return CatalogStore(out_dir)
+
+
+def load_catalog(csv_path=CATALOG_PATH, store_path=CATALOG_STORE_PATH, exclude=()):
+    """(DataFrame, version) from the columnar store when one has been built, else from the CSV.
+
+    The version is the CSV's content hash, and each version has its own store
+    directory. When the CSV has changed since the last build, the store for
+    the new version is built next to the old one, which is never modified, so
+    workers loading concurrently cannot break each other or a running worker.
+    """
+    version = file_hash(csv_path) if os.path.exists(csv_path) else None
+    if os.path.isdir(store_path):
+        if version is None:
+            store = current_store(store_path)
+        elif os.path.exists(os.path.join(store_dir(store_path, version), META_FILE)):
+            store = CatalogStore(store_dir(store_path, version))
+        else:
+            store = build_store(csv_path, store_path, version=version)
+        if store is not None:
+            return store.to_frame(exclude=exclude), store.version
+    return pd.read_csv(csv_path, usecols=lambda column: column not in exclude), version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the catalog CSV into a memory-mappable columnar store.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--out", default=CATALOG_STORE_PATH)
+    parser.add_argument("--prune", action="store_true", help="Also delete the stores of older CSV versions")
+    args = parser.parse_args()
+
+    store = build_store(args.catalog, args.out)
+    if args.prune:
+        prune_stores(args.out)
+    print(f"Saved {len(store)} rows x {len(store.columns)} columns to {store.path}")
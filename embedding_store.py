@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from ann_index import recall_at_k
+from neighbor_index import select_top_n
+from similarity import EMBEDDINGS_PATH, normalize_rows
+
+EMBEDDING_STORE_PATH = "embedding_store"
+DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class QuantizedEmbeddings:
+    """L2-normalised embeddings stored as float16 or int8 (with one scale per vector).
+
+    Vectors and scales are memory-mapped `.npy` files. `score` multiplies float32
+    queries against the store one block of rows at a time, so only a block is
+    ever widened to float32 and every block is a plain BLAS matmul.
+    """
+
+    def __init__(self, vectors, scales, block_size=2048):
+        self.vectors = vectors
+        self.scales = scales
+        self.block_size = block_size
+
+    @classmethod
+    def quantize(cls, embeddings, dtype="int8", block_size=2048):
+        embeddings = normalize_rows(embeddings)
+        if dtype == "float16":
+            return cls(embeddings.astype(np.float16), np.ones(len(embeddings), dtype=np.float32), block_size)
+        if dtype != "int8":
+            raise ValueError(f"dtype must be one of {sorted(DTYPES)}, got {dtype!r}")
+        scales = np.abs(embeddings).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        vectors = np.round(embeddings / scales[:, None]).astype(np.int8)
+        return cls(vectors, scales.astype(np.float32), block_size)
+
+    @property
+    def shape(self):
+        return self.vectors.shape
+
+    @property
+    def dtype(self):
+        return self.vectors.dtype
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + self.scales.nbytes
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def __getitem__(self, rows):
+        """Dequantized float32 vectors for `rows`."""
+        return self.vectors[rows].astype(np.float32) * self.scales[rows, None]
+
+    def score(self, queries):
+        """(queries x N) dot products of float32 `queries` with every stored vector."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = np.empty((queries.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            block = self.vectors[start:stop].astype(np.float32)
+            np.matmul(queries, block.T, out=scores[:, start:stop])
+            scores[:, start:stop] *= self.scales[start:stop]
+        return scores
+
+    def save(self, path=EMBEDDING_STORE_PATH):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "scales.npy"), self.scales)
+        with open(os.path.join(path, "meta.json"), "w") as handle:
+            json.dump({"dtype": str(self.dtype), "rows": len(self), "dim": self.shape[1]}, handle)
+
+    @classmethod
+    def load(cls, path=EMBEDDING_STORE_PATH, block_size=2048):
+        """Memory-map a saved store, checking the arrays against the dtype and shape in `meta.json`."""
+        with open(os.path.join(path, "meta.json")) as handle:
+            meta = json.load(handle)
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        if meta.get("dtype") not in DTYPES or vectors.dtype != DTYPES[meta["dtype"]]:
+            raise ValueError(f"{path} stores {vectors.dtype} vectors but meta.json says {meta.get('dtype')!r}; "
+                             "re-run `python embedding_store.py`.")
+        if vectors.shape != (meta["rows"], meta["dim"]) or scales.shape != (meta["rows"],):
+            raise ValueError(f"{path} holds {vectors.shape} vectors and {scales.shape} scales but meta.json says "
+                             f"{meta['rows']} x {meta['dim']}; re-run `python embedding_store.py`.")
+        return cls(vectors, scales, block_size)
+
+
+def quality_report(embeddings, dtypes=("float16", "int8"), k=10, sample=500, seed=0):
+    """Top-k overlap with float32 ranking, memory and throughput for each storage dtype."""
+    embeddings = normalize_rows(embeddings)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(embeddings), min(sample, len(embeddings)), replace=False)
+    queries = embeddings[rows]
+
+    start = time.perf_counter()
+    exact, _ = select_top_n(queries @ embeddings.T, k, exclude=rows)
+    elapsed = time.perf_counter() - start
+    report = [{
+        "dtype": "float32",
+        "recall@k": 1.0,
+        "memory_mb": embeddings.nbytes / 2 ** 20,
+        "queries_per_s": len(rows) / elapsed,
+    }]
+    for dtype in dtypes:
+        store = QuantizedEmbeddings.quantize(embeddings, dtype)
+        start = time.perf_counter()
+        approx, _ = select_top_n(store.score(queries), k, exclude=rows)
+        elapsed = time.perf_counter() - start
+        report.append({
+            "dtype": dtype,
+            "recall@k": recall_at_k(approx, exact),
+            "memory_mb": store.nbytes / 2 ** 20,
+            "queries_per_s": len(rows) / elapsed,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the book embeddings into a memory-mappable store.")
+    parser.add_argument("--embeddings", default=EMBEDDINGS_PATH)
+    parser.add_argument("--out", default=EMBEDDING_STORE_PATH)
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="int8")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    embeddings = joblib.load(args.embeddings)
+    QuantizedEmbeddings.quantize(embeddings, args.dtype).save(args.out)
+    print(f"Saved {args.dtype} embeddings to {args.out}")
+    for row in quality_report(embeddings, k=args.k):
+        print("  ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}" for key, value in row.items()))
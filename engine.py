@@ -0,0 +1,317 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from ann_index import ANN_INDEX_PATH, ANN_POOL, IVFIndex, rerank_rows, rerank_vectors
+from artifacts import ARTIFACTS_DIR, current_version, load_ann, load_version, version_embeddings, version_hash
+from catalog_store import CATALOG_STORE_PATH, TEXT_ONLY_COLUMNS, load_catalog
+from embedding_store import EMBEDDING_STORE_PATH
+from genre_index import GenreIndex
+from instrumentation import artifact_bytes, metrics
+from neighbor_index import NEIGHBOR_INDEX_PATH, NeighborIndex, select_top_n
+from reranking import DEFAULT_POOL, Reranker
+from similarity import CATALOG_PATH, HybridScorer, lazy_scorer, load_embeddings
+from title_index import TitleIndex
+
+RESULT_COLUMNS = ['Book Name', 'Author', 'Genre', 'Rating', 'Number of Reviews']
+
+
+class RecommendationEngine:
+    """Catalog plus the neighbor, title and genre indexes, with no Streamlit dependency.
+
+    Single-query methods are thin wrappers over the batch ones, so a batch job
+    can resolve and rank thousands of queries in one vectorized pass.
+    """
+
+    def __init__(self, df, neighbor_index, version=None, scorer=None, cache_key=None, ann=None, ann_pool=ANN_POOL,
+                 embeddings_loader=None):
+        if neighbor_index is not None and len(neighbor_index) != len(df):
+            raise ValueError(
+                f"Neighbor index has {len(neighbor_index)} rows but the catalog has {len(df)}; "
+                "rebuild it with `python neighbor_index.py`."
+            )
+        if ann is not None and len(ann) != len(df):
+            raise ValueError(f"ANN index has {len(ann)} rows but the catalog has {len(df)}; rebuild it with `python ann_index.py`.")
+        self.df = df
+        # None when no index has been built: title recommendations are then unavailable,
+        # everything else (title search, genres, analytics) still works
+        self.neighbor_index = neighbor_index
+        self.scorer = scorer if scorer is not None else getattr(neighbor_index, "scorer", None)
+        with metrics.stage("load.indexes"):
+            self.title_index = TitleIndex(df['Book Name'])
+            self.genre_index = GenreIndex(df['Genre'], df['Rating'], df['Number of Reviews'])
+        # Optional IVF index: serves neighbor requests past the stored K and free-text
+        # queries from `ann_pool` re-ranked candidates instead of a full catalog scan
+        self.ann = ann
+        self.ann_pool = ann_pool
+        self.version = version
+        # Content hash keying derived caches (analytics, reports); version names can be reused
+        self.cache_key = cache_key or version
+        # Loads only the embeddings for MMR, without the TF-IDF half of the scorer
+        self.embeddings_loader = embeddings_loader or (lambda: getattr(self.scorer, "embeddings", None))
+        self._reranker = None
+        if metrics.enabled:
+            metrics.gauge("catalog.books", len(df))
+            metrics.gauge("catalog.bytes", int(df.memory_usage(deep=True).sum()))
+            if neighbor_index is not None:
+                metrics.gauge("neighbor_index.bytes", artifact_bytes(neighbor_index.indices, neighbor_index.scores))
+                metrics.gauge("neighbor_index.k", neighbor_index.k)
+
+    @classmethod
+    def from_files(cls, catalog_path=CATALOG_PATH, index_path=NEIGHBOR_INDEX_PATH, store_path=CATALOG_STORE_PATH,
+                   ann_path=ANN_INDEX_PATH, embedding_store_path=EMBEDDING_STORE_PATH):
+        # Prefers the memory-mapped store built by `python catalog_store.py` over the CSV
+        # Descriptions are only needed to compute TF-IDF, so they are read when the scorer first loads
+        with metrics.stage("load.catalog"):
+            df, version = load_catalog(catalog_path, store_path, exclude=TEXT_ONLY_COLUMNS)
+        # Quantized embeddings from `python embedding_store.py` replace the float32 joblib when present
+        if not (embedding_store_path and os.path.isdir(embedding_store_path)):
+            embedding_store_path = None
+        scorer = lazy_scorer(df, embedding_store_path=embedding_store_path, loader=lambda: HybridScorer.from_catalog(
+            load_catalog(catalog_path, store_path)[0], embedding_store_path=embedding_store_path))
+        neighbor_index = None
+        if os.path.exists(index_path):
+            with metrics.stage("load.neighbor_index"):
+                neighbor_index = NeighborIndex.load(index_path, scorer=scorer)
+            if neighbor_index.version not in (None, version):
+                raise ValueError(
+                    f"{index_path} was built for a different version of {catalog_path}; "
+                    "rebuild it with `python neighbor_index.py`."
+                )
+        ann = None
+        if os.path.exists(ann_path):
+            ann = IVFIndex.load(ann_path)
+            if ann.version not in (None, version):
+                raise ValueError(
+                    f"{ann_path} was built for a different version of {catalog_path}; "
+                    "rebuild it with `python ann_index.py`."
+                )
+        return cls(df, neighbor_index, version=version, scorer=scorer, ann=ann,
+                   embeddings_loader=lambda: load_embeddings(len(df), embedding_store_path=embedding_store_path))
+
+    @classmethod
+    def from_artifacts(cls, root=ARTIFACTS_DIR, version=None):
+        """Engine for a published artifact version (default: the live one)."""
+        with metrics.stage("load.artifacts"):
+            df, neighbor_index, version = load_version(root, version)
+            ann = load_ann(root, version)
+        return cls(df, neighbor_index, version=version, cache_key=version_hash(root, version), ann=ann,
+                   embeddings_loader=lambda: version_embeddings(root, version))
+
+    @classmethod
+    def load(cls, version=None, root=ARTIFACTS_DIR):
+        """Engine for `version` or the live published one, falling back to the loose files."""
+        version = version or current_version(root)
+        if version is None:
+            return cls.from_files()
+        return cls.from_artifacts(root, version)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def has_neighbors(self):
+        return self.neighbor_index is not None
+
+    def require_neighbors(self):
+        if self.neighbor_index is None:
+            raise FileNotFoundError(
+                "No neighbor index for this catalog; run `python neighbor_index.py` "
+                "(the embeddings in models/ must have one row per catalog book)."
+            )
+
+    @property
+    def reranker(self):
+        # Built on first use from the catalog frame alone; embeddings load on the first MMR re-rank
+        if self._reranker is None:
+            self._reranker = Reranker(self.df, loader=self.embeddings_loader)
+        return self._reranker
+
+    # ---------- Lookup ----------
+    def find_titles(self, query, limit=5):
+        """Ranked "did you mean" candidates for a title query."""
+        with metrics.stage("lookup.title"):
+            matches = self.title_index.search(query, limit=limit)
+        metrics.count("lookup.title.queries")
+        metrics.count("lookup.title.matches", len(matches))
+        metrics.count("lookup.title.rows_scanned", len(self.title_index))
+        return matches
+
+    def match_titles(self, queries, fuzzy=False):
+        """Best `TitleMatch` for every query, None where nothing matches.
+
+        Only exact, prefix and substring matches count unless `fuzzy` is set:
+        a trigram look-alike is a "did you mean" suggestion, not an answer.
+        """
+        matches = [None] * len(queries)
+        with metrics.stage("lookup.title"):
+            for i, query in enumerate(queries):
+                found = self.title_index.search(query, limit=1)
+                if found and (fuzzy or found[0].kind != "fuzzy"):
+                    matches[i] = found[0]
+        metrics.count("lookup.title.queries", len(queries))
+        metrics.count("lookup.title.matches", sum(match is not None for match in matches))
+        metrics.count("lookup.title.rows_scanned", len(queries) * len(self.title_index))
+        return matches
+
+    def resolve_titles(self, queries, fuzzy=False):
+        """Row of the best match for every query, -1 where nothing matches (see `match_titles`)."""
+        return np.array([-1 if match is None else match.row for match in self.match_titles(queries, fuzzy)],
+                        dtype=np.int64)
+
+    # ---------- Recommendations ----------
+    def recommend_by_rows(self, rows, top_n=5):
+        """(queries x top_n) neighbor rows and scores for catalog rows; -1 pads only when top_n >= len(self)."""
+        self.require_neighbors()
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        # Requests within the stored top-K are served from the index; larger ones re-rank
+        # ANN candidates when there is an IVF index, else rescore the catalog
+        from_index = top_n <= self.neighbor_index.k
+        if from_index:
+            with metrics.stage("rank.neighbors"):
+                result = self.neighbor_index.neighbors_batch(rows, top_n)
+            scanned = top_n
+        elif self.ann is not None:
+            pool = max(self.ann_pool, top_n)
+            with metrics.stage("rank.ann"):
+                indices, scores = rerank_rows(self.ann, self.scorer, rows, top_n, pool=pool,
+                                              known=self.neighbor_index.indices[rows])
+            scanned = pool
+            # Rows whose candidates run out before top_n are rescored exactly
+            short = (indices < 0).any(axis=1)
+            if short.any():
+                with metrics.stage("rank.rescore"):
+                    exact, exact_scores = self.neighbor_index.neighbors_batch(rows[short], top_n)
+                indices[short, :exact.shape[1]], scores[short, :exact.shape[1]] = exact, exact_scores
+                metrics.count("rank.rows_scanned", int(short.sum()) * len(self))
+            result = indices, scores
+        else:
+            with metrics.stage("rank.rescore"):
+                result = self.neighbor_index.neighbors_batch(rows, top_n)
+            scanned = len(self)
+        metrics.count("rank.queries", len(rows))
+        metrics.count("rank.rows_scanned", len(rows) * scanned)
+        metrics.count("cache.neighbor_index.calls")
+        if not from_index:
+            metrics.count("cache.neighbor_index.miss")
+        return result
+
+    def rerank_rows(self, rows, top_n=5, pool=DEFAULT_POOL, **options):
+        """(queries x top_n) rows and scores re-ranked from each row's `pool` nearest neighbors.
+
+        The pool is capped at the index's K so re-ranking never rescans the
+        catalog; `options` are the filters and weights of `Reranker.rerank`.
+        Rows with fewer than `top_n` books left after filtering are padded with -1.
+        """
+        self.require_neighbors()
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        candidates, scores = self.recommend_by_rows(rows, min(pool, self.neighbor_index.k))
+        indices = np.full((len(rows), top_n), -1, dtype=np.int64)
+        reranked = np.full((len(rows), top_n), -np.inf, dtype=np.float32)
+        with metrics.stage("rank.rerank"):
+            for i, row in enumerate(rows):
+                found, found_scores = self.reranker.rerank(row, candidates[i], scores[i], top_n, **options)
+                indices[i, :len(found)] = found
+                reranked[i, :len(found)] = found_scores
+        metrics.count("rank.rerank.candidates", candidates.size)
+        return indices, reranked
+
+    def recommend_by_title_batch(self, queries, top_n=5, fuzzy=False):
+        """One result frame per title query; empty where the title is not found."""
+        rows = self.resolve_titles(queries, fuzzy)
+        found = rows >= 0
+        results = [self.df.iloc[[]][RESULT_COLUMNS] for _ in queries]
+        if found.any():
+            neighbors, _ = self.recommend_by_rows(rows[found], top_n)
+            with metrics.stage("slice"):
+                for i, book_indices in zip(np.flatnonzero(found), neighbors):
+                    results[i] = self.df.iloc[book_indices[book_indices >= 0]][RESULT_COLUMNS]
+        return results
+
+    def recommend_by_genre_batch(self, genres, top_n=5, mode="any", exclude_unrated=False):
+        """One result frame per genre query (a genre or a list of genres)."""
+        results = []
+        for genre in genres:
+            with metrics.stage("lookup.genre"):
+                rows = self.genre_index.query(genre, top_n=top_n, mode=mode, exclude_unrated=exclude_unrated)
+            metrics.count("lookup.genre.queries")
+            metrics.count("lookup.genre.matches", len(rows))
+            with metrics.stage("slice"):
+                results.append(self.df.iloc[rows][RESULT_COLUMNS].reset_index(drop=True))
+        return results
+
+    def recommend_by_text_batch(self, texts, top_n=5, tfidf_weight=None):
+        """One result frame per free-text query (e.g. a description).
+
+        With an IVF index and a sentence encoder, only each query's ANN
+        candidates are scored; otherwise the whole catalog is.
+        """
+        with metrics.stage("rank.text"):
+            tfidf, embeddings = self.scorer.embed_text(texts) if self.ann is not None else (None, None)
+            if embeddings is not None:
+                pool = max(self.ann_pool, top_n)
+                neighbors, _ = rerank_vectors(self.ann, self.scorer, tfidf, embeddings, top_n, pool=pool,
+                                              tfidf_weight=tfidf_weight)
+                scanned = pool
+            else:
+                neighbors, _ = select_top_n(self.scorer.score_text(texts, tfidf_weight), top_n)
+                scanned = len(self)
+        metrics.count("rank.queries", len(neighbors))
+        metrics.count("rank.rows_scanned", len(neighbors) * scanned)
+        with metrics.stage("slice"):
+            return [self.df.iloc[book_indices[book_indices >= 0]][RESULT_COLUMNS] for book_indices in neighbors]
+
+    def recommend_by_row(self, row, top_n=5):
+        book_indices, _ = self.recommend_by_rows([row], top_n)
+        book_indices = book_indices[0][book_indices[0] >= 0]
+        with metrics.stage("slice"):
+            return self.df.iloc[book_indices][RESULT_COLUMNS]
+
+    def recommend_by_row_reranked(self, row, top_n=5, pool=DEFAULT_POOL, **options):
+        book_indices, _ = self.rerank_rows([row], top_n, pool, **options)
+        book_indices = book_indices[0][book_indices[0] >= 0]
+        with metrics.stage("slice"):
+            return self.df.iloc[book_indices][RESULT_COLUMNS]
+
+    def recommend_by_title(self, query, top_n=5, fuzzy=False):
+        return self.recommend_by_title_batch([query], top_n, fuzzy)[0]
+
+    def recommend_by_genre(self, genre, top_n=5, mode="any", exclude_unrated=False):
+        return self.recommend_by_genre_batch([genre], top_n, mode, exclude_unrated)[0]
+
+    def recommend_by_text(self, text, top_n=5, tfidf_weight=None):
+        return self.recommend_by_text_batch([text], top_n, tfidf_weight)[0]
+
+    def precompute_all(self, top_n=5, batch_size=4096):
+        """Recommendations for every book as a long frame (Book Index, Rank, Recommended Index, Score).
+
+        Padding (-1) is left out, so a book has fewer rows only when the catalog is smaller than top_n.
+        """
+        frames = []
+        for start in range(0, len(self), batch_size):
+            rows = np.arange(start, min(start + batch_size, len(self)))
+            neighbors, scores = self.recommend_by_rows(rows, top_n)
+            frames.append(pd.DataFrame({
+                "Book Index": np.repeat(rows, neighbors.shape[1]),
+                "Rank": np.tile(np.arange(1, neighbors.shape[1] + 1), len(rows)),
+                "Recommended Index": neighbors.ravel(),
+                "Score": scores.ravel(),
+            }))
+            frames[-1] = frames[-1][frames[-1]["Recommended Index"] >= 0]
+        return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute title recommendations for the whole catalog.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--index", default=NEIGHBOR_INDEX_PATH)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--out", default="recommendations.csv")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine.from_files(args.catalog, args.index)
+    recommendations = engine.precompute_all(top_n=args.top_n)
+    recommendations.to_csv(args.out, index=False)
+    print(f"Saved {len(recommendations)} recommendations for {len(engine)} books to {args.out}")
@@ -0,0 +1,193 @@
+import argparse
+import json
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analytics import file_hash
+from ann_index import ANN_POOL, IVFIndex, rerank_rows
+from artifacts import ARTIFACTS_DIR, current_version, version_hash
+from embedding_store import QuantizedEmbeddings
+from neighbor_index import NEIGHBOR_INDEX_PATH, NeighborIndex, build_neighbor_index, select_top_n
+from similarity import CATALOG_PATH, EMBEDDINGS_PATH, TEXT_COLUMNS, HybridScorer
+
+EVALUATION_RESULTS_PATH = "evaluation_results.json"
+
+# Scorer backends: name -> share of the score taken from TF-IDF
+BACKENDS = {"TF-IDF": 1.0, "BERT": 0.0, "Hybrid": 0.5}
+
+# Embedding dtype of the quantized hybrid backend (see embedding_store.py)
+QUANTIZED_DTYPE = "int8"
+
+METRICS = ["Precision", "Recall", "NDCG", "MAP"]
+
+# Relevance is "shares the query's genre", so the genre must not be in the scored text
+EVALUATION_TEXT_COLUMNS = [column for column in TEXT_COLUMNS if column != "Genre"]
+
+
+# ---------- Metrics ----------
+def ranking_metrics(relevant, n_relevant):
+    """Per-query Precision/Recall/NDCG/MAP@K from a (queries x K) boolean relevance matrix.
+
+    `n_relevant` is the number of relevant books each query could have returned.
+    """
+    relevant = relevant.astype(np.float64)
+    k = relevant.shape[1]
+    hits = relevant.sum(axis=1)
+    ideal = np.minimum(n_relevant, k)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal_dcg = np.cumsum(discounts)[np.maximum(ideal, 1) - 1]
+    precision_at = np.cumsum(relevant, axis=1) / np.arange(1, k + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "Precision": hits / k,
+            "Recall": np.where(n_relevant > 0, hits / n_relevant, 0.0),
+            "NDCG": np.where(ideal > 0, (relevant * discounts).sum(axis=1) / ideal_dcg, 0.0),
+            "MAP": np.where(ideal > 0, (precision_at * relevant).sum(axis=1) / ideal, 0.0),
+        }
+
+
+def genre_queries(df, exclude_genres=("Unknown",)):
+    """Query rows and genre codes: a book is relevant to a query when it shares its genre."""
+    codes, _ = pd.factorize(df['Genre'].astype(object))
+    counts = np.bincount(codes)
+    known = ~df['Genre'].astype(object).isin(exclude_genres).to_numpy()
+    rows = np.flatnonzero(known & (counts[codes] > 1))
+    return rows, codes, counts
+
+
+# ---------- Backends ----------
+def scorer_ranker(scorer, tfidf_weight=None):
+    """Ranker that scores each batch against the whole catalog with `scorer`."""
+    def rank(rows, k):
+        return select_top_n(scorer(rows, tfidf_weight), k, exclude=rows)[0]
+    return rank
+
+
+def index_rankers(scorer, k=10, ann_pool=ANN_POOL, quantized_dtype=QUANTIZED_DTYPE):
+    """Rankers for the serving paths: the top-K neighbor index, IVF re-ranking and quantized embeddings.
+
+    Each is built here from `scorer`, so it sees the same genre-free features
+    as the exact hybrid backend it approximates.
+    """
+    neighbor_index = build_neighbor_index(scorer, k=k)
+    ann = IVFIndex.build(scorer.embeddings)
+    store = QuantizedEmbeddings.quantize(scorer.embeddings, quantized_dtype)
+    quantized = HybridScorer(scorer.vectorizer, scorer.tfidf, store, tfidf_weight=scorer.tfidf_weight)
+    return {
+        "Neighbor index": lambda rows, k: neighbor_index.neighbors_batch(rows, k)[0],
+        "IVF re-rank": lambda rows, k: rerank_rows(ann, scorer, rows, k, pool=ann_pool)[0],
+        f"Hybrid {quantized_dtype}": scorer_ranker(quantized),
+    }
+
+
+# ---------- Evaluation ----------
+def evaluate_backend(rank, rows, codes, counts, k=10, batch_size=256, workers=4, latency_sample=200):
+    """Quality metrics over `rows` (ranked in parallel batches) plus latency, throughput and peak memory.
+
+    `rank(rows, k)` returns (rows x k) recommended rows; -1 entries count as
+    misses. Peak memory is measured in a separate pass over `workers` batches,
+    so tracemalloc's per-allocation overhead does not slow the timed passes.
+    """
+    batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+
+    def run(batch):
+        top = rank(batch, k)
+        relevant = (top >= 0) & (codes[top] == codes[batch][:, None])
+        return ranking_metrics(relevant, counts[codes[batch]] - 1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        per_batch = list(pool.map(run, batches))
+    elapsed = time.perf_counter() - start
+
+    # Peak memory depends on how many batches are in flight, not on how many there are
+    tracemalloc.start()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, batches[:workers]))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for row in rows[:latency_sample]:
+        start = time.perf_counter()
+        rank(np.array([row]), k)
+        latencies.append(1000 * (time.perf_counter() - start))
+
+    results = {name: float(np.mean(np.concatenate([batch[name] for batch in per_batch]))) for name in METRICS}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    results.update({
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "throughput_qps": len(rows) / elapsed,
+        "peak_memory_mb": peak / 2 ** 20,
+    })
+    return results
+
+
+def evaluate(df, scorer, k=10, backends=BACKENDS, indexes=True, **kwargs):
+    """Results per backend: the scorer at each of `backends`' weights, then (with `indexes`) the serving paths."""
+    rows, codes, counts = genre_queries(df)
+    if len(rows) == 0:
+        raise ValueError("No book shares a known genre with another book; nothing to evaluate.")
+    rankers = {name: scorer_ranker(scorer, weight) for name, weight in backends.items()}
+    if indexes:
+        rankers.update(index_rankers(scorer, k=k))
+    return {name: evaluate_backend(rank, rows, codes, counts, k=k, **kwargs) for name, rank in rankers.items()}
+
+
+def serving_version(root=ARTIFACTS_DIR, index_path=NEIGHBOR_INDEX_PATH):
+    """Cache key of what the app serves now (see `RecommendationEngine.cache_key`), or None if unknown.
+
+    That is the live artifact version's content hash, else the catalog
+    version recorded in the loose neighbor index.
+    """
+    version = current_version(root)
+    if version is not None:
+        return version_hash(root, version)
+    try:
+        return NeighborIndex.load(index_path).version
+    except FileNotFoundError:
+        return None
+
+
+def save_results(results, path=EVALUATION_RESULTS_PATH, **meta):
+    with open(path, "w") as handle:
+        json.dump({**meta, "models": results}, handle, indent=2)
+
+
+def load_results(path=EVALUATION_RESULTS_PATH):
+    """(DataFrame indexed by model, metadata) from a results file, or (None, None) if it is missing."""
+    try:
+        with open(path) as handle:
+            data = json.load(handle)
+    except FileNotFoundError:
+        return None, None
+    frame = pd.DataFrame.from_dict(data.pop("models"), orient="index")
+    frame.index.name = "Model"
+    return frame, data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the TF-IDF, embedding and hybrid scorers.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--out", default=EVALUATION_RESULTS_PATH)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embeddings", default=EMBEDDINGS_PATH,
+                        help="Embeddings encoded without the genre: python similarity.py --exclude Genre --out <path>")
+    parser.add_argument("--no-indexes", action="store_true",
+                        help="Skip the neighbor index, IVF and quantized backends")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.catalog)
+    scorer = HybridScorer.from_catalog(df, embeddings_path=args.embeddings, text_columns=EVALUATION_TEXT_COLUMNS)
+    results = evaluate(df, scorer, k=args.k, indexes=not args.no_indexes, workers=args.workers)
+    save_results(results, args.out, k=args.k, catalog_version=file_hash(args.catalog),
+                 index_version=serving_version(), text_columns=EVALUATION_TEXT_COLUMNS, embeddings=args.embeddings,
+                 created=time.strftime("%Y-%m-%d %H:%M:%S"))
+    print(pd.DataFrame.from_dict(results, orient="index").to_string())
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Rating the scraped catalog uses for books without any ratings
+UNRATED = -1.0
+
+
+class GenreIndex:
+    """Genre -> row ids, each list presorted by (Rating, Number of Reviews) descending.
+
+    Lists hold positions in one global ranking (ties keep catalog order, like
+    a stable `sort_values`), so combining genres is a merge of sorted integer
+    arrays and never re-sorts the catalog.
+    """
+
+    def __init__(self, genres, ratings, reviews):
+        ratings = np.asarray(ratings, dtype=np.float64)
+        reviews = np.asarray(reviews, dtype=np.float64)
+        self.order = np.lexsort((np.arange(len(ratings)), -reviews, -ratings))
+        self.rated = ratings[self.order] != UNRATED
+
+        keys = np.array([str(genre).lower() for genre in genres], dtype=object)
+        names, codes = np.unique(keys[self.order], return_inverse=True)
+        positions = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[positions], np.arange(len(names) + 1))
+        self.lists = {
+            name: positions[bounds[i]:bounds[i + 1]]
+            for i, name in enumerate(names)
+        }
+
+    def __len__(self):
+        return len(self.order)
+
+    def genres(self):
+        return list(self.lists)
+
+    def _term_positions(self, term):
+        # Case-insensitive substring match against the distinct genres, like str.contains
+        term = term.strip().lower()
+        lists = [positions for name, positions in self.lists.items() if term in name]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(lists), kind="mergesort")
+
+    def query(self, genres, top_n=5, mode="any", exclude_unrated=False):
+        """Return the row ids of the `top_n` best-ranked books matching `genres`.
+
+        `genres` is one genre or a list of them; `mode` is "any" (OR) or "all" (AND).
+        """
+        if isinstance(genres, str):
+            genres = [genres]
+        if mode not in ("any", "all"):
+            raise ValueError(f"mode must be 'any' or 'all', got {mode!r}")
+
+        term_positions = [self._term_positions(genre) for genre in genres]
+        if not term_positions:
+            return np.empty(0, dtype=np.int64)
+        positions = term_positions[0]
+        for other in term_positions[1:]:
+            if mode == "any":
+                positions = np.union1d(positions, other)
+            else:
+                positions = np.intersect1d(positions, other, assume_unique=True)
+
+        if exclude_unrated:
+            positions = positions[self.rated[positions]]
+        return self.order[positions[:top_n]]
@@ -0,0 +1,244 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Set RECOMMENDER_METRICS=1 to record stage timers and counters,
+# RECOMMENDER_PROFILE=1 to also run the sampling profiler, and
+# RECOMMENDER_METRICS_PATH to write a snapshot there when the process exits.
+METRICS_ENV = "RECOMMENDER_METRICS"
+PROFILE_ENV = "RECOMMENDER_PROFILE"
+METRICS_PATH_ENV = "RECOMMENDER_METRICS_PATH"
+METRICS_PATH = "metrics.json"
+
+# Most recent durations kept per stage for percentiles
+TIMER_SAMPLES = 1024
+
+
+def env_flag(name):
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Stage timers, counters and gauges shared by the engine, app and service.
+
+    When disabled, `stage()` returns a shared no-op context manager and the
+    other methods return after one attribute check, so call sites can stay
+    in the hot path unconditionally.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timers = {}
+            self.counters = Counter()
+            self.gauges = {}
+            self.started = time.time()
+
+    def stage(self, name):
+        """Context manager timing one execution of stage `name`."""
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = {"count": 0, "total": 0.0, "max": 0.0, "samples": []}
+            timer["count"] += 1
+            timer["total"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            samples = timer["samples"]
+            if len(samples) < TIMER_SAMPLES:
+                samples.append(seconds)
+            else:
+                samples[timer["count"] % TIMER_SAMPLES] = seconds
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+
+    def gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Plain-dict view of every metric; cache hit rates are derived from `cache.<name>.calls/.miss`."""
+        with self.lock:
+            timers = {}
+            for name, timer in sorted(self.timers.items()):
+                samples = sorted(timer["samples"])
+                timers[name] = {
+                    "count": timer["count"],
+                    "total_ms": 1000 * timer["total"],
+                    "mean_ms": 1000 * timer["total"] / timer["count"],
+                    "p50_ms": 1000 * samples[len(samples) // 2],
+                    "p95_ms": 1000 * samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+                    "max_ms": 1000 * timer["max"],
+                }
+            counters = dict(sorted(self.counters.items()))
+            gauges = dict(sorted(self.gauges.items()))
+        caches = {}
+        for name, calls in counters.items():
+            if name.startswith("cache.") and name.endswith(".calls") and calls:
+                cache = name[len("cache."):-len(".calls")]
+                misses = counters.get(f"cache.{cache}.miss", 0)
+                caches[cache] = {"calls": calls, "misses": misses, "hit_rate": 1 - misses / calls}
+        return {
+            "enabled": self.enabled,
+            "uptime_s": time.time() - self.started,
+            "timers": timers,
+            "counters": counters,
+            "gauges": gauges,
+            "caches": caches,
+        }
+
+    def dump(self, path=METRICS_PATH):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as handle:
+            json.dump(self.snapshot(), handle, indent=2, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+metrics = Metrics(enabled=env_flag(METRICS_ENV) or env_flag(PROFILE_ENV))
+if metrics.enabled and os.environ.get(METRICS_PATH_ENV):
+    atexit.register(metrics.dump, os.environ[METRICS_PATH_ENV])
+
+
+def artifact_bytes(*arrays):
+    """Total in-memory size of NumPy arrays / scipy sparse matrices (None entries are skipped)."""
+    total = 0
+    for array in arrays:
+        if array is None:
+            continue
+        if hasattr(array, "data") and hasattr(array, "indices") and hasattr(array, "indptr"):
+            total += array.data.nbytes + array.indices.nbytes + array.indptr.nbytes
+        else:
+            total += getattr(array, "nbytes", 0)
+    return total
+
+
+# ---------- Sampling Profiler ----------
+class SamplingProfiler:
+    """Opt-in statistical profiler: a daemon thread samples every other thread's stack.
+
+    Every `interval` seconds the innermost frame of each thread (self time)
+    and every function on its stack (cumulative time) get one sample. No
+    tracing hooks are installed, so profiled code runs at full speed apart
+    from the sampler's own share of the GIL.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.self_samples = Counter()
+        self.cumulative_samples = Counter()
+        self.samples = 0
+        self.thread = None
+        self.stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return self
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.self_samples[frame_name(frame)] += 1
+                seen = set()
+                depth = 0
+                while frame is not None and depth < self.max_depth:
+                    name = frame_name(frame)
+                    if name not in seen:
+                        seen.add(name)
+                        self.cumulative_samples[name] += 1
+                    frame = frame.f_back
+                    depth += 1
+                self.samples += 1
+
+    def top(self, limit=20):
+        """Hottest functions as dicts of self and cumulative share of samples."""
+        total = max(self.samples, 1)
+        return [
+            {"function": name, "self": self.self_samples[name] / total, "cumulative": count / total}
+            for name, count in self.cumulative_samples.most_common(limit)
+        ]
+
+    def reset(self):
+        self.self_samples.clear()
+        self.cumulative_samples.clear()
+        self.samples = 0
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def start_profiler_from_env(interval=0.005):
+    """A running profiler when RECOMMENDER_PROFILE is set, else None."""
+    if not env_flag(PROFILE_ENV):
+        return None
+    return SamplingProfiler(interval=interval).start()
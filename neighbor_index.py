@@ -0,0 +1,112 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from analytics import file_hash
+from similarity import CATALOG_PATH, TFIDF_WEIGHT, HybridScorer
+
+NEIGHBOR_INDEX_PATH = "neighbor_index.npz"
+DEFAULT_K = 50
+
+
+class NeighborIndex:
+    """Fixed top-K neighbor lists per book (int32 indices + float32 scores), excluding the book itself.
+
+    Replaces the dense N x N `hybrid_sim.npy`: memory is N * K instead of N * N.
+    Requests for more than K neighbors are answered by `scorer`, a callable that
+    returns full similarity rows on demand. `version` records the catalog the
+    lists were built for, so a stale index is not served against a newer catalog.
+    """
+
+    def __init__(self, indices, scores, scorer=None, version=None):
+        self.indices = indices
+        self.scores = scores
+        self.scorer = scorer
+        self.version = version
+
+    @property
+    def k(self):
+        return self.indices.shape[1]
+
+    def __len__(self):
+        return self.indices.shape[0]
+
+    def neighbors(self, row, top_n):
+        """Return (indices, scores) of the `top_n` most similar books to `row`, best first."""
+        indices, scores = self.neighbors_batch([row], top_n)
+        return indices[0], scores[0]
+
+    def neighbors_batch(self, rows, top_n):
+        """Return (queries x top_n) neighbor indices and scores, never including the query itself."""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        if top_n <= self.k:
+            return self.indices[rows, :top_n], self.scores[rows, :top_n]
+        if self.scorer is None:
+            raise ValueError(f"Index only stores {self.k} neighbors and has no scorer for top_n={top_n}.")
+        return select_top_n(self.scorer(rows), top_n, exclude=rows)
+
+    def save(self, path=NEIGHBOR_INDEX_PATH):
+        extra = {} if self.version is None else {"version": self.version}
+        np.savez(path, indices=self.indices, scores=self.scores, **extra)
+
+    @classmethod
+    def load(cls, path=NEIGHBOR_INDEX_PATH, scorer=None):
+        with np.load(path) as data:
+            version = str(data["version"]) if "version" in data else None
+            return cls(data["indices"], data["scores"], scorer=scorer, version=version)
+
+
+def select_top_n(scores, top_n, exclude=None):
+    """Row-wise top-n of a (queries x N) score matrix by partial selection, best first.
+
+    `exclude` holds one column per row to drop (the query book itself). It is
+    removed by index, so duplicates tied with it at 1.0 are still returned.
+    """
+    scores = np.array(scores, dtype=np.float32)
+    if exclude is not None:
+        scores[np.arange(scores.shape[0]), exclude] = -np.inf
+    top_n = min(top_n, scores.shape[1] - (exclude is not None))
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(top, order, axis=1).astype(np.int32),
+        np.take_along_axis(top_scores, order, axis=1),
+    )
+
+
+def build_neighbor_index(scorer, k=DEFAULT_K, block_size=512):
+    """Build the index a block of rows at a time so the full N x N matrix never exists."""
+    n = len(scorer)
+    k = min(k, n - 1)
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        block = scorer(rows)
+        indices[rows], scores[rows] = select_top_n(block, k, exclude=rows)
+    return NeighborIndex(indices, scores, scorer=scorer)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the top-K neighbor index from the models/ artifacts.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--out", default=NEIGHBOR_INDEX_PATH)
+    parser.add_argument("--k", type=int, default=DEFAULT_K)
+    parser.add_argument("--tfidf-weight", type=float, default=TFIDF_WEIGHT)
+    parser.add_argument("--embedding-store", default=None, help="Score with a quantized store from embedding_store.py")
+    parser.add_argument("--ann", action="store_true", help="Re-rank IVF candidates instead of scoring every pair")
+    parser.add_argument("--pool", type=int, default=200, help="ANN candidates re-ranked per book (with --ann)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.catalog)
+    scorer = HybridScorer.from_catalog(df, tfidf_weight=args.tfidf_weight, embedding_store_path=args.embedding_store)
+    if args.ann:
+        from ann_index import IVFIndex, build_neighbor_index_ann
+        index = build_neighbor_index_ann(IVFIndex.build(scorer.embeddings), scorer, k=args.k, pool=args.pool)
+    else:
+        index = build_neighbor_index(scorer, k=args.k)
+    index.version = file_hash(args.catalog)
+    index.save(args.out)
+    print(f"Saved {len(index)} x {index.k} neighbor index to {args.out}")
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from engine import RecommendationEngine
+from title_index import normalize_title
+
+REPORTS_DIR = "reports"
+
+# Boost added to a neighbor's hybrid score when it shares the query book's genre
+GENRE_BOOST = 0.1
+
+
+def reports_path(cache_key, reports_dir=REPORTS_DIR):
+    return os.path.join(reports_dir, f"{cache_key}.json")
+
+
+# ---------- Genre Reports ----------
+def top_in_genres(engine, genres, top_n=5):
+    """Best-rated books for any of `genres` (a Book ID / Name / Author / Rating table)."""
+    rows = engine.genre_index.query(genres, top_n=top_n, exclude_unrated=True)
+    table = engine.df.iloc[rows][["Book Name", "Author", "Rating"]].astype(object)
+    table.insert(0, "Book ID", rows)
+    return table
+
+
+def hidden_gems(df, top_n=20, max_reviews_quantile=0.25):
+    """Highest-rated books among the least-reviewed quarter of the rated catalog."""
+    ratings = df["Rating"].to_numpy(dtype=np.float64)
+    reviews = df["Number of Reviews"].to_numpy(dtype=np.float64)
+    rated = ratings >= 0
+    max_reviews = np.quantile(reviews[rated], max_reviews_quantile)
+    rows = np.flatnonzero(rated & (reviews <= max_reviews))
+    rows = rows[np.lexsort((rows, reviews[rows], -ratings[rows]))][:top_n]
+    table = df.iloc[rows][["Book Name", "Author", "Rating", "Number of Reviews"]].astype(object)
+    table.insert(0, "Index", rows)
+    return table
+
+
+# ---------- Similarity Reports ----------
+def hybrid_vs_enhanced(engine, row, top_n=5, genre_boost=GENRE_BOOST):
+    """Neighbors of `row` by hybrid score, and the same candidates re-ranked with a same-genre boost."""
+    neighbors, scores = engine.neighbor_index.neighbors(row, engine.neighbor_index.k)
+    genres = engine.df["Genre"].astype(object).to_numpy()
+    boosted = scores + genre_boost * (genres[neighbors] == genres[row])
+    enhanced = neighbors[np.argsort(-boosted, kind="stable")]
+
+    def table(rows):
+        rows = rows[:top_n]
+        result = engine.df.iloc[rows][["Book Name", "Author", "Genre", "Rating"]].astype(object)
+        result.insert(0, "ID", rows)
+        return result
+
+    return table(neighbors), table(enhanced)
+
+
+def degenerate_rows(embeddings, titles):
+    """Rows whose embedding is zero or identical to that of a book with a different title."""
+    embeddings = np.asarray(embeddings)
+    zero = ~np.any(embeddings, axis=1)
+    _, inverse, counts = np.unique(embeddings, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    shared = counts[inverse] > 1
+    title_codes, _ = pd.factorize(pd.Series(titles).map(normalize_title))
+    # Groups of identical vectors that span several titles point at empty or boilerplate text
+    group_titles = pd.Series(title_codes[shared]).groupby(inverse[shared]).nunique()
+    multi_title = np.zeros(len(counts), dtype=bool)
+    multi_title[group_titles.index[group_titles.to_numpy() > 1]] = True
+    return zero | multi_title[inverse]
+
+
+def most_similar_pairs(engine, top_n=20, per_book=5, degenerate=None):
+    """Most similar distinct book pairs, read from the top-K neighbor lists (never an N x N scan).
+
+    Duplicate listings of the same title and books flagged in `degenerate`
+    are skipped, since their 1.0 scores say nothing about the catalog.
+    """
+    per_book = min(per_book, engine.neighbor_index.k)
+    neighbors = engine.neighbor_index.indices[:, :per_book].astype(np.int64)
+    scores = engine.neighbor_index.scores[:, :per_book].ravel()
+    first = np.repeat(np.arange(len(engine)), per_book)
+    second = neighbors.ravel()
+
+    titles = engine.df["Book Name"].astype(object).map(normalize_title).to_numpy()
+    keep = titles[first] != titles[second]
+    if degenerate is not None:
+        keep &= ~degenerate[first] & ~degenerate[second]
+    low, high = np.minimum(first, second)[keep], np.maximum(first, second)[keep]
+    scores = scores[keep]
+
+    order = np.lexsort((high, low, -scores))
+    pair_ids = low[order] * len(engine) + high[order]
+    _, first_seen = np.unique(pair_ids, return_index=True)
+    order = order[np.sort(first_seen)][:top_n]
+
+    names = engine.df["Book Name"].astype(object).to_numpy()
+    return pd.DataFrame({
+        "Book 1": names[low[order]],
+        "Book 2": names[high[order]],
+        "Similarity": np.round(scores[order].astype(np.float64), 4),
+    })
+
+
+# ---------- Build / Load ----------
+def build_reports(engine, sample_row=None):
+    """Every table of the "Scenario Based" and "DA - 2" pages for the engine's catalog version."""
+    if sample_row is None:
+        sample_row = int(np.argmax(engine.df["Number of Reviews"].to_numpy()))
+    engine.require_neighbors()
+    embeddings = getattr(engine.scorer, "embeddings", None)
+    degenerate = None if embeddings is None else degenerate_rows(embeddings, engine.df["Book Name"])
+    hybrid, enhanced = hybrid_vs_enhanced(engine, sample_row)
+    tables = {
+        "thriller": top_in_genres(engine, "thriller"),
+        "sci_fi": top_in_genres(engine, ["science fiction", "sci-fi"]),
+        "hidden_gems": hidden_gems(engine.df),
+        "hybrid": hybrid,
+        "enhanced": enhanced,
+        "pairs": most_similar_pairs(engine, degenerate=degenerate),
+    }
+    return {
+        "version": engine.version,
+        "cache_key": engine.cache_key,
+        "sample_book": str(engine.df["Book Name"].iloc[sample_row]),
+        "tables": {name: table.to_dict(orient="split", index=False) for name, table in tables.items()},
+    }
+
+
+def save_reports(reports, reports_dir=REPORTS_DIR):
+    os.makedirs(reports_dir, exist_ok=True)
+    path = reports_path(reports["cache_key"], reports_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(reports, handle, indent=2, default=lambda value: value.item())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_reports(cache_key, reports_dir=REPORTS_DIR):
+    """(sample book, {name: DataFrame}) for an engine's `cache_key`, or (None, None) if not built yet."""
+    try:
+        with open(reports_path(cache_key, reports_dir)) as handle:
+            reports = json.load(handle)
+    except FileNotFoundError:
+        return None, None
+    tables = {
+        name: pd.DataFrame(table["data"], columns=table["columns"])
+        for name, table in reports["tables"].items()
+    }
+    return reports["sample_book"], tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Scenario Based and DA - 2 report tables.")
+    parser.add_argument("--version", default=None, help="Artifact version (default: the live one)")
+    parser.add_argument("--sample-row", type=int, default=None, help="Book used for the hybrid vs enhanced table")
+    args = parser.parse_args()
+
+    engine = RecommendationEngine.load(args.version)
+    path = save_reports(build_reports(engine, args.sample_row))
+    print(f"Saved reports for catalog version {engine.version} to {path}")
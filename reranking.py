@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from collections import Counter
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from title_index import normalize_title
+
+# Candidates taken from the neighbor index per query; capped at the index's K
+DEFAULT_POOL = 200
+# Weight of the similarity an MMR pick loses per unit of redundancy with books already picked
+DIVERSITY = 0.3
+# Weight of the Bayesian rating prior (0..1) added to the similarity score
+PRIOR_WEIGHT = 0.1
+
+SERIES_PATTERN = re.compile(r"^(.*?)[,:(\s]+(?:book|volume|vol\.|part|#)\s*\d+\b", re.IGNORECASE)
+
+
+def series_name(title):
+    """Normalised series of a title such as "Killing Floor: Jack Reacher, Book 1", or "" if none.
+
+    The series is the text between the last ':' or '(' and the book marker,
+    so a title without one ("Harry Potter and the Goblet of Fire, Book 4")
+    has no series.
+    """
+    match = SERIES_PATTERN.match(str(title))
+    if not match or not re.search(r"[:(]", match.group(1)):
+        return ""
+    series = re.split(r"[:(]", match.group(1))[-1].strip(" ,")
+    series = normalize_title(series)
+    return series[:-len(" series")] if series.endswith(" series") else series
+
+
+def title_script(title):
+    """Dominant Unicode script of a title's letters ("Latin", "Devanagari", ...), "" if it has none.
+
+    The catalog has no language column, so the script stands in for language.
+    """
+    scripts = Counter(unicodedata.name(char, "").split(" ")[0] for char in str(title) if char.isalpha())
+    scripts.pop("", None)
+    return scripts.most_common(1)[0][0].title() if scripts else ""
+
+
+def rating_prior(ratings, reviews):
+    """Bayesian average rating scaled to 0..1, shrunk towards the catalog mean for books with few reviews.
+
+    Unrated books (negative rating) get the catalog mean.
+    """
+    ratings = np.asarray(ratings, dtype=np.float64)
+    reviews = np.asarray(reviews, dtype=np.float64)
+    rated = ratings >= 0
+    if not rated.any():
+        return np.full(len(ratings), 0.5, dtype=np.float32)
+    mean = ratings[rated].mean()
+    confidence = max(np.median(reviews[rated]), 1.0)
+    votes = np.where(rated, reviews, 0.0)
+    prior = (votes * np.where(rated, ratings, 0.0) + confidence * mean) / (votes + confidence)
+    return (prior / 5.0).astype(np.float32)
+
+
+class Reranker:
+    """Filters, prior and MMR diversification over a fixed candidate pool.
+
+    Per-book attributes are precomputed once as arrays, so re-ranking a pool
+    of P candidates costs O(P) for filters and the prior and O(top_n * P * d)
+    for diversification, independent of the catalog size. Embeddings are only
+    needed for diversification, so `loader` is called on the first MMR
+    re-rank rather than at construction.
+    """
+
+    def __init__(self, df, embeddings=None, loader=None):
+        self.ratings = df['Rating'].to_numpy(dtype=np.float32)
+        self.reviews = df['Number of Reviews'].to_numpy(dtype=np.float64)
+        self.prices = df['Price'].to_numpy(dtype=np.float32)
+        self.minutes = df['Listening Time'].to_numpy(dtype=np.float32)
+        self.prior = rating_prior(self.ratings, self.reviews)
+        titles = df['Book Name'].astype(object)
+        self.title_codes, _ = pd.factorize(titles.map(normalize_title))
+        self.author_codes, _ = pd.factorize(df['Author'].astype(object))
+        series = titles.map(series_name)
+        self.series_codes, _ = pd.factorize(series.mask(series == ""))
+        # Titles without letters get code -1, so "" is never offered as a script
+        scripts = titles.map(title_script)
+        self.script_codes, self.scripts = pd.factorize(scripts.mask(scripts == ""))
+        self.loader = loader if embeddings is None else (lambda: embeddings)
+
+    @cached_property
+    def embeddings(self):
+        return None if self.loader is None else self.loader()
+
+    def __len__(self):
+        return len(self.prior)
+
+    def filter_mask(self, rows, min_rating=None, max_price=None, min_minutes=None, max_minutes=None, scripts=None):
+        """Boolean mask over `rows` of the books that pass every given filter."""
+        keep = np.ones(len(rows), dtype=bool)
+        if min_rating is not None:
+            keep &= self.ratings[rows] >= min_rating
+        if max_price is not None:
+            keep &= self.prices[rows] <= max_price
+        if min_minutes is not None:
+            keep &= self.minutes[rows] >= min_minutes
+        if max_minutes is not None:
+            keep &= self.minutes[rows] <= max_minutes
+        if scripts:
+            wanted = [code for code, script in enumerate(self.scripts) if script in set(scripts)]
+            keep &= np.isin(self.script_codes[rows], wanted)
+        return keep
+
+    def rerank(self, row, candidates, scores, top_n=5, diversity=DIVERSITY, prior_weight=PRIOR_WEIGHT, **filters):
+        """(rows, scores) of the best `top_n` of `row`'s candidates after filtering and MMR.
+
+        Each pick maximises relevance (similarity + prior) minus `diversity`
+        times the candidate's largest redundancy with the books already
+        picked: 1 for the same author or series, else their embedding cosine.
+        Other listings of the query's own title are dropped.
+        """
+        candidates = np.asarray(candidates, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float32)
+        keep = (candidates >= 0) & self.filter_mask(candidates, **filters)
+        if row is not None:
+            keep &= self.title_codes[candidates] != self.title_codes[row]
+        candidates, scores = candidates[keep], scores[keep]
+        relevance = scores + prior_weight * self.prior[candidates]
+        top_n = min(top_n, len(candidates))
+        if top_n == 0 or diversity == 0:
+            order = np.argsort(-relevance, kind="stable")[:top_n]
+            return candidates[order], relevance[order]
+
+        vectors = None if self.embeddings is None else np.asarray(self.embeddings[candidates], dtype=np.float32)
+        authors = self.author_codes[candidates]
+        series = self.series_codes[candidates]
+        redundancy = np.zeros(len(candidates), dtype=np.float32)
+        available = np.ones(len(candidates), dtype=bool)
+        picked = []
+        for _ in range(top_n):
+            gain = np.where(available, relevance - diversity * redundancy, -np.inf)
+            best = int(np.argmax(gain))
+            picked.append(best)
+            available[best] = False
+            overlap = (authors == authors[best]) | ((series >= 0) & (series == series[best]))
+            similarity = overlap.astype(np.float32)
+            if vectors is not None:
+                similarity = np.maximum(similarity, vectors @ vectors[best])
+            np.maximum(redundancy, similarity, out=redundancy)
+        picked = np.array(picked, dtype=np.int64)
+        return candidates[picked], relevance[picked]
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from engine import RESULT_COLUMNS, RecommendationEngine
+from instrumentation import metrics
+from title_index import normalize_title
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+MAX_TOP_N = 100
+MAX_BATCH = 1000
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequestError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class RecommendationService:
+    """JSON recommendation API over a `RecommendationEngine`, independent of the transport.
+
+    Scoring runs on a thread pool so the event loop only parses and routes.
+    Identical requests that arrive while one is already being computed wait
+    on the same future instead of scoring again; each caller still gets its
+    own copy of the result, echoing its own query.
+    """
+
+    def __init__(self, engine, workers=4):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.in_flight = {}
+        self.coalesced = 0
+        # Plain Python lists per result column, so responses never build a DataFrame
+        self.columns = {
+            column: [None if value != value else value for value in engine.df[column].astype(object).tolist()]
+            for column in RESULT_COLUMNS
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def records(self, rows, scores=None):
+        records = []
+        for i, row in enumerate(rows):
+            if row < 0:
+                continue
+            record = {"row": int(row), **{column: values[row] for column, values in self.columns.items()}}
+            if scores is not None:
+                record["score"] = round(float(scores[i]), 6)
+            records.append(record)
+        return records
+
+    def require_neighbors(self):
+        if not self.engine.has_neighbors:
+            raise RequestError("Title recommendations are unavailable: no neighbor index was built", status=503)
+
+    # ---------- Scoring (worker threads) ----------
+    def _titles(self, queries, top_n):
+        matches = self.engine.match_titles(queries)
+        rows = np.array([-1 if match is None else match.row for match in matches], dtype=np.int64)
+        found = rows >= 0
+        results = [{"query": query, "match": None, "results": []} for query in queries]
+        if found.any():
+            neighbors, scores = self.engine.recommend_by_rows(rows[found], top_n)
+            for i, book_indices, book_scores in zip(np.flatnonzero(found), neighbors, scores):
+                results[i]["match"] = {**self.records([rows[i]])[0], "kind": matches[i].kind}
+                results[i]["results"] = self.records(book_indices, book_scores)
+        return results
+
+    def _genres(self, genres, top_n, mode, exclude_unrated):
+        return [
+            {"genre": genre, "results": self.records(
+                self.engine.genre_index.query(genre, top_n=top_n, mode=mode, exclude_unrated=exclude_unrated))}
+            for genre in genres
+        ]
+
+    # ---------- Coalescing ----------
+    async def _coalesced(self, key, func, *args):
+        future = self.in_flight.get(key)
+        metrics.count("cache.in_flight.calls")
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        metrics.count("cache.in_flight.miss")
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        self.in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+    async def title(self, query, top_n=5):
+        key = ("title", normalize_title(query), top_n)
+        result = (await self._coalesced(key, self._titles, [query], top_n))[0]
+        return {**result, "query": query}
+
+    async def genre(self, genre, top_n=5, mode="any", exclude_unrated=False):
+        key = ("genre", genre.lower(), top_n, mode, exclude_unrated)
+        result = (await self._coalesced(key, self._genres, [genre], top_n, mode, exclude_unrated))[0]
+        return {**result, "genre": genre}
+
+    async def batch(self, titles=(), genres=(), top_n=5, mode="any", exclude_unrated=False):
+        """All title and genre queries of one request, each kind scored in one vectorized call."""
+        titles, genres = list(titles), list(genres)
+        key = ("batch", tuple(normalize_title(title) for title in titles), tuple(genre.lower() for genre in genres),
+               top_n, mode, exclude_unrated)
+        result = await self._coalesced(key, self._batch, titles, genres, top_n, mode, exclude_unrated)
+        return {
+            "titles": [{**entry, "query": query} for entry, query in zip(result["titles"], titles)],
+            "genres": [{**entry, "genre": genre} for entry, genre in zip(result["genres"], genres)],
+        }
+
+    def _batch(self, titles, genres, top_n, mode, exclude_unrated):
+        return {
+            "titles": self._titles(titles, top_n) if titles else [],
+            "genres": self._genres(genres, top_n, mode, exclude_unrated),
+        }
+
+    # ---------- Routing ----------
+    async def handle(self, method, target, body=b""):
+        """(status, JSON-serialisable payload) for one request."""
+        try:
+            url = urlsplit(target)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            routes = {
+                "/health": ("GET", self._health),
+                "/metrics": ("GET", self._metrics),
+                "/recommend/title": ("GET", self._get_title),
+                "/recommend/genre": ("GET", self._get_genre),
+                "/recommend/batch": ("POST", self._post_batch),
+            }
+            if url.path not in routes:
+                raise RequestError(f"Unknown path {url.path!r}", status=404)
+            allowed, handler = routes[url.path]
+            if method != allowed:
+                raise RequestError(f"{url.path} only accepts {allowed}", status=405)
+            metrics.count(f"service.requests{url.path}")
+            with metrics.stage(f"service{url.path}"):
+                return 200, await handler(params, body)
+        except RequestError as error:
+            metrics.count(f"service.errors.{error.status}")
+            return error.status, {"error": str(error)}
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def _health(self, params, body):
+        return {"status": "ok", "version": self.engine.version, "books": len(self.engine),
+                "in_flight": len(self.in_flight), "coalesced": self.coalesced}
+
+    async def _metrics(self, params, body):
+        return metrics.snapshot()
+
+    async def _get_title(self, params, body):
+        query = params.get("q", "").strip()
+        if not query:
+            raise RequestError("Missing query parameter 'q'")
+        self.require_neighbors()
+        return await self.title(query, top_n_param(params))
+
+    async def _get_genre(self, params, body):
+        genre = params.get("genre", "").strip()
+        if not genre:
+            raise RequestError("Missing query parameter 'genre'")
+        return await self.genre(genre, top_n_param(params), mode_param(params), flag_param(params, "exclude_unrated"))
+
+    async def _post_batch(self, params, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise RequestError("Body must be JSON")
+        if not isinstance(payload, dict):
+            raise RequestError("Body must be a JSON object")
+        titles, genres = payload.get("titles", []), payload.get("genres", [])
+        if not isinstance(titles, list) or not isinstance(genres, list) or \
+                not all(isinstance(value, str) for value in [*titles, *genres]):
+            raise RequestError("'titles' and 'genres' must be lists of strings")
+        if len(titles) + len(genres) > MAX_BATCH:
+            raise RequestError(f"At most {MAX_BATCH} queries per batch")
+        if titles:
+            self.require_neighbors()
+        return await self.batch(titles, genres, top_n_param(payload), mode_param(payload),
+                                flag_param(payload, "exclude_unrated"))
+
+
+def top_n_param(params):
+    try:
+        top_n = int(params.get("top_n", 5))
+    except (TypeError, ValueError):
+        raise RequestError("'top_n' must be an integer")
+    if not 1 <= top_n <= MAX_TOP_N:
+        raise RequestError(f"'top_n' must be between 1 and {MAX_TOP_N}")
+    return top_n
+
+
+def mode_param(params):
+    mode = params.get("mode", "any")
+    if mode not in ("any", "all"):
+        raise RequestError("'mode' must be 'any' or 'all'")
+    return mode
+
+
+def flag_param(params, name):
+    value = params.get(name, False)
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+# ---------- HTTP ----------
+def encode_response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def serve_connection(service, reader, writer):
+    """HTTP/1.1 with keep-alive: one request at a time per connection, many connections at once."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split(maxsplit=2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+            if length > MAX_BODY_BYTES:
+                writer.write(encode_response(413, {"error": "Request body too large"}, keep_alive=False))
+                break
+            body = await reader.readexactly(length) if length else b""
+            status, payload = await service.handle(method, target, body)
+            writer.write(encode_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return await asyncio.start_server(lambda reader, writer: serve_connection(service, reader, writer), host, port)
+
+
+class LocalClient:
+    """Calls the service in-process (no sockets), with the same JSON round trip as HTTP."""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def request(self, method, target, payload=None):
+        body = b"" if payload is None else json.dumps(payload).encode()
+        status, response = await self.service.handle(method, target, body)
+        return status, json.loads(json.dumps(response))
+
+    async def get(self, target):
+        return await self.request("GET", target)
+
+    async def post(self, target, payload):
+        return await self.request("POST", target, payload)
+
+
+async def main(args):
+    service = RecommendationService(RecommendationEngine.load(args.version), workers=args.workers)
+    server = await start_server(service, args.host, args.port)
+    print(f"Serving catalog version {service.engine.version} ({len(service.engine)} books) on http://{args.host}:{args.port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve title, genre and batch recommendations as JSON over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--version", default=None, help="Artifact version (default: the live one)")
+    asyncio.run(main(parser.parse_args()))
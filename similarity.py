@@ -0,0 +1,267 @@
+import argparse
+from functools import cached_property
+
+import joblib
+import numpy as np
+
+# ---------- Artifact Paths ----------
+CATALOG_PATH = "audible_data_cleaned.csv"
+VECTORIZER_PATH = "models/tfidf_vectorizer (3).joblib"
+EMBEDDINGS_PATH = "models/book_embeddings_updated (3).joblib"
+
+# Sentence-transformers model for free-text queries (384-dimensional, like the book embeddings)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Columns joined into the text the TF-IDF vectorizer scores
+TEXT_COLUMNS = ["Book Name", "Author", "Genre", "Description"]
+
+# Share of the hybrid score that comes from TF-IDF (the rest is the embedding)
+TFIDF_WEIGHT = 0.5
+
+
+# ---------- Feature Loading ----------
+def book_text(df, columns=TEXT_COLUMNS):
+    return df[list(columns)].astype(object).fillna("").astype(str).agg(" ".join, axis=1)
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def load_embeddings(n_rows, embeddings_path=EMBEDDINGS_PATH, embedding_store_path=None):
+    """L2-normalised embeddings for a catalog of `n_rows` books.
+
+    They come from the joblib file as float32, or from a quantized
+    `embedding_store_path` (see embedding_store.py) when one is given.
+    """
+    if embedding_store_path is not None:
+        from embedding_store import QuantizedEmbeddings
+        embeddings_path = embedding_store_path
+        embeddings = QuantizedEmbeddings.load(embedding_store_path)
+    else:
+        embeddings = normalize_rows(joblib.load(embeddings_path))
+    if embeddings.shape[0] != n_rows:
+        raise ValueError(
+            f"{embeddings_path} has {embeddings.shape[0]} rows but the catalog has {n_rows}; "
+            "rebuild the embeddings for this catalog first."
+        )
+    return embeddings
+
+
+def load_models(df, vectorizer_path=VECTORIZER_PATH, embeddings_path=EMBEDDINGS_PATH, embedding_store_path=None,
+                text_columns=TEXT_COLUMNS):
+    """Return (fitted vectorizer, sparse TF-IDF, L2-normalised embeddings) for every row of `df`.
+
+    See `load_embeddings` for where the embeddings come from. TF-IDF rows are
+    computed from `text_columns` of `df`.
+    """
+    embeddings = load_embeddings(len(df), embeddings_path, embedding_store_path)
+    vectorizer = joblib.load(vectorizer_path)
+    tfidf = vectorizer.transform(book_text(df, text_columns)).astype(np.float32).tocsr()
+    return vectorizer, tfidf, embeddings
+
+
+def load_encoder(model_name=EMBEDDING_MODEL):
+    """Sentence encoder for free-text queries, or None when sentence-transformers is not installed."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda texts: model.encode(list(texts), convert_to_numpy=True)
+
+
+def embed_catalog(df, encoder, batch_size=256, columns=TEXT_COLUMNS):
+    """Float32 embeddings of every book's text, encoded `batch_size` books at a time."""
+    text = book_text(df, columns).tolist()
+    return np.concatenate([
+        np.asarray(encoder(text[start:start + batch_size]), dtype=np.float32)
+        for start in range(0, len(text), batch_size)
+    ])
+
+
+# ---------- Scoring ----------
+def embedding_scores(embeddings, queries):
+    """Dot products of query vectors with every catalog embedding (float32 array or quantized store)."""
+    if hasattr(embeddings, "score"):
+        return embeddings.score(queries)
+    return queries @ embeddings.T
+
+
+def blend(text, dense, tfidf_weight=TFIDF_WEIGHT):
+    return (tfidf_weight * text + (1.0 - tfidf_weight) * dense).astype(np.float32)
+
+
+class HybridScorer:
+    """Request-time hybrid similarity against the catalog, O(N * d) per query.
+
+    TF-IDF similarity is a sparse dot product with the catalog matrix and the
+    embedding similarity a float32 matmul over normalised vectors, so a new
+    book or a typed description needs no N x N precompute. Calling the scorer
+    with catalog rows makes it usable as a `NeighborIndex` fallback.
+    """
+
+    def __init__(self, vectorizer, tfidf, embeddings, tfidf_weight=TFIDF_WEIGHT, encoder=None):
+        self.vectorizer = vectorizer
+        self.tfidf = tfidf
+        self.tfidf_t = tfidf.T.tocsr()
+        self.embeddings = embeddings
+        self.tfidf_weight = tfidf_weight
+        self.encoder = encoder
+
+    @classmethod
+    def from_catalog(cls, df, tfidf_weight=TFIDF_WEIGHT, encoder=None, vectorizer_path=VECTORIZER_PATH,
+                     embeddings_path=EMBEDDINGS_PATH, embedding_store_path=None, text_columns=TEXT_COLUMNS):
+        vectorizer, tfidf, embeddings = load_models(df, vectorizer_path, embeddings_path, embedding_store_path,
+                                                    text_columns)
+        return cls(vectorizer, tfidf, embeddings, tfidf_weight=tfidf_weight, encoder=encoder)
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def __call__(self, rows, tfidf_weight=None):
+        return self.score_rows(rows, tfidf_weight)
+
+    def _weight(self, tfidf_weight):
+        return self.tfidf_weight if tfidf_weight is None else tfidf_weight
+
+    def score_rows(self, rows, tfidf_weight=None):
+        """(len(rows) x N) hybrid scores of catalog rows against the catalog.
+
+        A weight of 1 or 0 computes only the TF-IDF or only the embedding half.
+        """
+        rows = np.atleast_1d(rows)
+        tfidf_weight = self._weight(tfidf_weight)
+        if tfidf_weight >= 1.0:
+            return (self.tfidf[rows] @ self.tfidf_t).toarray().astype(np.float32)
+        dense = embedding_scores(self.embeddings, self.embeddings[rows])
+        if tfidf_weight <= 0.0:
+            return np.asarray(dense, dtype=np.float32)
+        text = (self.tfidf[rows] @ self.tfidf_t).toarray()
+        return blend(text, dense, tfidf_weight)
+
+    def score_candidates(self, row, candidates, tfidf_weight=None):
+        """Hybrid scores of one catalog row against `candidates` only, O(len(candidates) * d)."""
+        text = (self.tfidf[candidates] @ self.tfidf[row].T).toarray().ravel()
+        dense = self.embeddings[candidates] @ self.embeddings[row]
+        return blend(text, dense, self._weight(tfidf_weight))
+
+    def score_block(self, rows, candidates, tfidf_weight=None):
+        """(len(rows) x len(candidates)) hybrid scores between two sets of catalog rows."""
+        text = (self.tfidf[rows] @ self.tfidf[candidates].T).toarray()
+        dense = self.embeddings[rows] @ self.embeddings[candidates].T
+        return blend(text, dense, self._weight(tfidf_weight))
+
+    def score_vectors(self, tfidf, embeddings, tfidf_weight=None):
+        """Scores for rows that are not in the catalog, given their TF-IDF rows and embeddings."""
+        text = (tfidf.astype(np.float32) @ self.tfidf_t).toarray()
+        dense = embedding_scores(self.embeddings, normalize_rows(embeddings))
+        return blend(text, dense, self._weight(tfidf_weight))
+
+    def score_vector_candidates(self, tfidf, embedding, candidates, tfidf_weight=None):
+        """Hybrid scores of one out-of-catalog query (TF-IDF row + normalised embedding) against `candidates` only."""
+        text = (self.tfidf[candidates] @ tfidf.T).toarray().ravel()
+        dense = self.embeddings[candidates] @ embedding
+        return blend(text, dense, self._weight(tfidf_weight))
+
+    def embed_text(self, texts):
+        """(TF-IDF rows, normalised embeddings) of free-text queries; embeddings are None without an encoder."""
+        if isinstance(texts, str):
+            texts = [texts]
+        tfidf = self.vectorizer.transform(texts).astype(np.float32).tocsr()
+        embeddings = None if self.encoder is None else normalize_rows(self.encoder(texts))
+        return tfidf, embeddings
+
+    def score_text(self, texts, tfidf_weight=None):
+        """(len(texts) x N) scores for free-text queries such as a typed description.
+
+        Without an encoder only the TF-IDF half can be computed, so the score is
+        the TF-IDF similarity alone.
+        """
+        tfidf, embeddings = self.embed_text(texts)
+        if embeddings is None:
+            return (tfidf @ self.tfidf_t).toarray()
+        return self.score_vectors(tfidf, embeddings, tfidf_weight)
+
+
+class LazyHybridScorer:
+    """`HybridScorer` that only loads the models the first time it is used.
+
+    The sentence encoder is loaded separately, on the first free-text query.
+    `loader` overrides how the scorer is built (e.g. from saved artifacts);
+    otherwise embeddings come from `embedding_store_path` when one is given.
+    """
+
+    def __init__(self, df, tfidf_weight=TFIDF_WEIGHT, encoder_model=EMBEDDING_MODEL, loader=None,
+                 embedding_store_path=None):
+        self.df = df
+        self.tfidf_weight = tfidf_weight
+        self.encoder_model = encoder_model
+        self.loader = loader
+        self.embedding_store_path = embedding_store_path
+
+    @cached_property
+    def scorer(self):
+        if self.loader is not None:
+            return self.loader()
+        return HybridScorer.from_catalog(self.df, tfidf_weight=self.tfidf_weight,
+                                         embedding_store_path=self.embedding_store_path)
+
+    @cached_property
+    def encoder(self):
+        return load_encoder(self.encoder_model) if self.encoder_model else None
+
+    @property
+    def embeddings(self):
+        return self.scorer.embeddings
+
+    def __len__(self):
+        return len(self.df)
+
+    def __call__(self, rows, tfidf_weight=None):
+        return self.scorer.score_rows(rows, tfidf_weight)
+
+    def score_candidates(self, row, candidates, tfidf_weight=None):
+        return self.scorer.score_candidates(row, candidates, tfidf_weight)
+
+    def score_vector_candidates(self, tfidf, embedding, candidates, tfidf_weight=None):
+        return self.scorer.score_vector_candidates(tfidf, embedding, candidates, tfidf_weight)
+
+    def embed_text(self, texts):
+        if self.scorer.encoder is None:
+            self.scorer.encoder = self.encoder
+        return self.scorer.embed_text(texts)
+
+    def score_text(self, texts, tfidf_weight=None):
+        if self.scorer.encoder is None:
+            self.scorer.encoder = self.encoder
+        return self.scorer.score_text(texts, tfidf_weight)
+
+
+def lazy_scorer(df, tfidf_weight=TFIDF_WEIGHT, encoder_model=EMBEDDING_MODEL, loader=None, embedding_store_path=None):
+    """Scorer callable that only loads the models the first time it is used."""
+    return LazyHybridScorer(df, tfidf_weight=tfidf_weight, encoder_model=encoder_model, loader=loader,
+                            embedding_store_path=embedding_store_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode the book embeddings so they match the catalog row for row.")
+    parser.add_argument("--catalog", default=CATALOG_PATH)
+    parser.add_argument("--out", default=EMBEDDINGS_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--exclude", nargs="*", default=[], choices=TEXT_COLUMNS,
+                        help="Text columns to leave out, e.g. Genre for evaluation.py")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    encoder = load_encoder(args.model)
+    if encoder is None:
+        raise SystemExit("sentence-transformers is required to encode the catalog: pip install sentence-transformers")
+    df = pd.read_csv(args.catalog)
+    columns = [column for column in TEXT_COLUMNS if column not in args.exclude]
+    joblib.dump(embed_catalog(df, encoder, columns=columns), args.out)
+    print(f"Saved {len(df)} embeddings to {args.out}")
@@ -0,0 +1,96 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from ann_index import IVFIndex
+from artifacts import append_books, load_ann, load_version, merge_neighbors, publish
+from engine import RecommendationEngine
+from neighbor_index import build_neighbor_index
+from similarity import CATALOG_PATH, VECTORIZER_PATH, HybridScorer, book_text, normalize_rows
+
+N_BOOKS = 160
+K = 10
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    """Real catalog rows with random embeddings, so no row count has to match models/."""
+    df = pd.read_csv(CATALOG_PATH, nrows=N_BOOKS)
+    vectorizer = joblib.load(VECTORIZER_PATH)
+    tfidf = vectorizer.transform(book_text(df)).astype(np.float32).tocsr()
+    embeddings = normalize_rows(np.random.default_rng(0).normal(size=(N_BOOKS, 16)))
+    return df, vectorizer, tfidf, embeddings
+
+
+def full_build(catalog, n):
+    df, vectorizer, tfidf, embeddings = catalog
+    return build_neighbor_index(HybridScorer(vectorizer, tfidf[:n], embeddings[:n]), k=K)
+
+
+@pytest.mark.parametrize("max_block_elements", [1 << 24, 64])
+@pytest.mark.parametrize("n_new", [1, 30])
+def test_append_matches_full_rebuild(tmp_path, catalog, n_new, max_block_elements):
+    df, vectorizer, tfidf, embeddings = catalog
+    n_old = N_BOOKS - n_new
+    root = str(tmp_path / "artifacts")
+    publish(root, df.head(n_old), tfidf[:n_old], embeddings[:n_old], full_build(catalog, n_old))
+
+    # 64 elements force blocks of 1-2 rows in both scoring loops
+    version = append_books(df.iloc[n_old:], root, new_embeddings=embeddings[n_old:],
+                           max_block_elements=max_block_elements)
+    appended, neighbor_index, loaded_version = load_version(root, exclude=())
+    expected = full_build(catalog, N_BOOKS)
+
+    assert loaded_version == version
+    assert len(appended) == N_BOOKS
+    np.testing.assert_array_equal(neighbor_index.indices, expected.indices)
+    np.testing.assert_allclose(neighbor_index.scores, expected.scores, atol=1e-6)
+
+
+def test_append_carries_ann_index(tmp_path, catalog):
+    df, vectorizer, tfidf, embeddings = catalog
+    n_old = N_BOOKS - 30
+    root = str(tmp_path / "artifacts")
+    ann = IVFIndex.build(embeddings[:n_old], n_lists=8)
+    first = publish(root, df.head(n_old), tfidf[:n_old], embeddings[:n_old], full_build(catalog, n_old), ann=ann)
+    assert load_ann(root, first).version == first
+
+    version = append_books(df.iloc[n_old:], root, new_embeddings=embeddings[n_old:])
+    appended = load_ann(root, version)
+    assert appended.version == version
+    assert len(appended) == N_BOOKS
+    np.testing.assert_array_equal(np.sort(appended.rows), np.arange(N_BOOKS))
+    np.testing.assert_array_equal(appended.centroids, ann.centroids)
+    # Old books stay in their cells, new ones go to their closest centroid
+    cells = np.repeat(np.arange(appended.n_lists), np.diff(appended.offsets))[np.argsort(appended.rows)]
+    old_cells = np.repeat(np.arange(ann.n_lists), np.diff(ann.offsets))[np.argsort(ann.rows)]
+    np.testing.assert_array_equal(cells[:n_old], old_cells)
+    np.testing.assert_array_equal(cells[n_old:], (embeddings[n_old:] @ ann.centroids.T).argmax(axis=1))
+
+
+def test_ann_rows_beyond_pool_are_rescored(tmp_path, catalog):
+    df, vectorizer, tfidf, embeddings = catalog
+    root = str(tmp_path / "artifacts")
+    # One probed cell out of 16 holds far fewer than top_n candidates
+    ann = IVFIndex.build(embeddings, n_lists=16, nprobe=1)
+    publish(root, df, tfidf, embeddings, full_build(catalog, N_BOOKS), ann=ann)
+    engine = RecommendationEngine.from_artifacts(root)
+    engine.ann_pool = 5
+    engine.neighbor_index.scorer = HybridScorer(vectorizer, tfidf, embeddings)
+
+    top_n = 100
+    indices, scores = engine.recommend_by_rows(np.arange(4), top_n)
+    expected, expected_scores = full_build(catalog, N_BOOKS).neighbors_batch(np.arange(4), top_n)
+    assert (indices >= 0).all()
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-6)
+    assert all(len(set(row)) == top_n for row in indices)
+    assert len(engine.recommend_by_row(0, top_n)) == top_n
+
+
+def test_merge_neighbors_keeps_best_k():
+    indices = np.array([[5, 6, 7]], dtype=np.int32)
+    scores = np.array([[0.9, 0.5, 0.1]], dtype=np.float32)
+    merged, merged_scores = merge_neighbors(indices, scores, np.array([[8, 9]]), np.array([[0.6, 0.05]]))
+    np.testing.assert_array_equal(merged, [[5, 8, 6]])
+    np.testing.assert_allclose(merged_scores, [[0.9, 0.6, 0.5]])
@@ -0,0 +1,49 @@
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+from catalog_store import TEXT_ONLY_COLUMNS, build_store, current_store, load_catalog, prune_stores
+from similarity import CATALOG_PATH
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    df = pd.read_csv(CATALOG_PATH, nrows=300)
+    csv_path = str(tmp_path / "catalog.csv")
+    df.to_csv(csv_path, index=False)
+    return df, csv_path, str(tmp_path / "store")
+
+
+def test_round_trip(catalog):
+    df, csv_path, store_path = catalog
+    build_store(csv_path, store_path)
+    loaded, _ = load_catalog(csv_path, store_path, exclude=TEXT_ONLY_COLUMNS)
+    assert list(loaded.columns) == [column for column in df.columns if column not in TEXT_ONLY_COLUMNS]
+    pd.testing.assert_frame_equal(loaded.astype(object), df.drop(columns=TEXT_ONLY_COLUMNS).astype(object),
+                                  check_dtype=False)
+
+
+def _load(args):
+    csv_path, store_path = args
+    df, version = load_catalog(csv_path, store_path)
+    return len(df), version
+
+
+def test_stale_store_rebuilds_concurrently_without_touching_the_old_one(catalog):
+    df, csv_path, store_path = catalog
+    old = build_store(csv_path, store_path)
+    old_files = sorted(os.listdir(old.path))
+    df.head(200).to_csv(csv_path, index=False)
+
+    with multiprocessing.get_context("fork").Pool(16) as pool:
+        results = pool.map(_load, [(csv_path, store_path)] * 16)
+
+    assert {rows for rows, _ in results} == {200}
+    assert len({version for _, version in results}) == 1
+    assert sorted(os.listdir(old.path)) == old_files
+    assert current_store(store_path).version == results[0][1]
+    prune_stores(store_path)
+    assert not os.path.exists(old.path)
+    assert len(load_catalog(csv_path, store_path)[0]) == 200
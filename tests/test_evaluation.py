@@ -0,0 +1,51 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from evaluation import BACKENDS, METRICS, QUANTIZED_DTYPE, evaluate, ranking_metrics
+from similarity import CATALOG_PATH, VECTORIZER_PATH, HybridScorer, book_text, normalize_rows
+
+
+def test_ranking_metrics_by_hand():
+    relevant = np.array([
+        [1, 0, 1, 0],
+        [0, 0, 0, 0],
+        [1, 1, 0, 0],
+    ], dtype=bool)
+    n_relevant = np.array([2, 0, 5])
+    metrics = ranking_metrics(relevant, n_relevant)
+
+    # Hits at ranks 1 and 3 of 2 relevant; at ranks 1 and 2 of 5, of which only 4 fit in the top 4
+    np.testing.assert_allclose(metrics["Precision"], [0.5, 0.0, 0.5])
+    np.testing.assert_allclose(metrics["Recall"], [1.0, 0.0, 0.4])
+    np.testing.assert_allclose(metrics["NDCG"], [
+        (1 + 1 / 2) / (1 + 1 / np.log2(3)),
+        0.0,
+        (1 + 1 / np.log2(3)) / (1 + 1 / np.log2(3) + 1 / 2 + 1 / np.log2(5)),
+    ])
+    np.testing.assert_allclose(metrics["MAP"], [(1 + 2 / 3) / 2, 0.0, (1 + 1) / 4])
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Every backend on real catalog rows with random embeddings and four synthetic genres."""
+    df = pd.read_csv(CATALOG_PATH, nrows=120)
+    df["Genre"] = np.resize(["Fiction", "History", "Science", "Poetry"], len(df))
+    vectorizer = joblib.load(VECTORIZER_PATH)
+    tfidf = vectorizer.transform(book_text(df)).astype(np.float32).tocsr()
+    embeddings = normalize_rows(np.random.default_rng(0).normal(size=(len(df), 16)))
+    scorer = HybridScorer(vectorizer, tfidf, embeddings)
+    return evaluate(df, scorer, k=5, batch_size=32, workers=2, latency_sample=5)
+
+
+def test_evaluate_covers_serving_paths(results):
+    assert list(results) == [*BACKENDS, "Neighbor index", "IVF re-rank", f"Hybrid {QUANTIZED_DTYPE}"]
+    for name, result in results.items():
+        for metric in METRICS:
+            assert 0.0 <= result[metric] <= 1.0, (name, metric)
+        assert result["throughput_qps"] > 0
+
+    # The neighbor index stores the exact hybrid top-K, so it must score the same
+    for metric in METRICS:
+        assert results["Neighbor index"][metric] == pytest.approx(results["Hybrid"][metric])
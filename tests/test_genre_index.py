@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from genre_index import UNRATED, GenreIndex
+from similarity import CATALOG_PATH
+
+
+def reference_query(df, genres, top_n=5, mode="any", exclude_unrated=False):
+    """The original `str.contains` + `sort_values` lookup, extended to several genres."""
+    if isinstance(genres, str):
+        genres = [genres]
+    masks = [df["Genre"].str.contains(genre.strip(), case=False, na=False, regex=False) for genre in genres]
+    mask = np.logical_or.reduce(masks) if mode == "any" else np.logical_and.reduce(masks)
+    if exclude_unrated:
+        mask &= df["Rating"] != UNRATED
+    matches = df[mask].sort_values(by=["Rating", "Number of Reviews"], ascending=False)
+    return matches.head(top_n).index.to_numpy()
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    df = pd.read_csv(CATALOG_PATH)
+    return df, GenreIndex(df["Genre"], df["Rating"], df["Number of Reviews"])
+
+
+@pytest.mark.parametrize("genres", [
+    "thriller",
+    "Science Fiction",
+    "romance",
+    "fi",
+    "unknown",
+    "no such genre",
+    ["thriller", "mystery"],
+    ["science fiction", "sci-fi"],
+    ["fantasy", " romance "],
+])
+@pytest.mark.parametrize("mode", ["any", "all"])
+@pytest.mark.parametrize("exclude_unrated", [False, True])
+@pytest.mark.parametrize("top_n", [1, 5, 50])
+def test_query_matches_sort_values(catalog, genres, mode, exclude_unrated, top_n):
+    df, index = catalog
+    expected = reference_query(df, genres, top_n, mode, exclude_unrated)
+    result = index.query(genres, top_n=top_n, mode=mode, exclude_unrated=exclude_unrated)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_ties_keep_catalog_order():
+    df = pd.DataFrame({
+        "Genre": ["Drama", "drama", "Drama", "Comedy"],
+        "Rating": [4.0, 4.0, 4.5, 4.0],
+        "Number of Reviews": [10, 10, 3, 10],
+    })
+    index = GenreIndex(df["Genre"], df["Rating"], df["Number of Reviews"])
+    np.testing.assert_array_equal(index.query("DRAMA", top_n=5), [2, 0, 1])
+
+
+def test_regex_metacharacters_are_literal():
+    df = pd.DataFrame({
+        "Genre": ["Sci-Fi (Hard)", "Sci-Fi", "C++ Programming"],
+        "Rating": [4.0, 5.0, 3.0],
+        "Number of Reviews": [1, 1, 1],
+    })
+    index = GenreIndex(df["Genre"], df["Rating"], df["Number of Reviews"])
+    np.testing.assert_array_equal(index.query("(hard)"), [0])
+    np.testing.assert_array_equal(index.query("c++"), [2])
+
+
+def test_rejects_unknown_mode(catalog):
+    _, index = catalog
+    with pytest.raises(ValueError):
+        index.query("thriller", mode="xor")
@@ -0,0 +1,45 @@
+import numpy as np
+
+from neighbor_index import build_neighbor_index, select_top_n
+
+
+def test_duplicate_tied_with_query_is_kept():
+    # Rows 0 and 1 are the same title: both score 1.0 against query row 0
+    scores = np.array([
+        [1.0, 1.0, 0.5, 0.2],
+        [1.0, 1.0, 0.5, 0.2],
+    ], dtype=np.float32)
+    indices, top_scores = select_top_n(scores, 2, exclude=[0, 1])
+    np.testing.assert_array_equal(indices, [[1, 2], [0, 2]])
+    np.testing.assert_array_equal(top_scores, [[1.0, 0.5], [1.0, 0.5]])
+
+
+def test_top_n_is_capped_at_the_other_rows():
+    indices, _ = select_top_n(np.eye(3, dtype=np.float32), 10, exclude=[0, 1, 2])
+    assert indices.shape == (3, 2)
+    assert not (indices == np.arange(3)[:, None]).any()
+
+
+class MatrixScorer:
+    """Scorer callable over a precomputed (N x N) score matrix."""
+
+    def __init__(self, scores):
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __call__(self, rows):
+        return self.scores[np.atleast_1d(rows)]
+
+
+def test_index_matches_full_scores_and_falls_back_past_k():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    full = vectors @ vectors.T
+    index = build_neighbor_index(MatrixScorer(full), k=5)
+    for top_n in (3, 5, 12):
+        indices, scores = index.neighbors_batch([0, 7], top_n)
+        expected, expected_scores = select_top_n(full[[0, 7]], top_n, exclude=[0, 7])
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_allclose(scores, expected_scores)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from reranking import Reranker, rating_prior, series_name
+
+
+@pytest.fixture
+def reranker():
+    """Query row 0, a second listing of its title (5), a series pair (1, 2) and an author pair (1, 3)."""
+    df = pd.DataFrame({
+        "Book Name": ["Query Book", "Alpha: Saga, Book 1", "Beta: Saga, Book 2", "Gamma", "Delta",
+                      "Query  book", "Epsilon"],
+        "Author": ["Quinn", "Ames", "Baker", "Ames", "Cole", "Quinn", "Dunn"],
+        "Rating": [4.0, 4.0, 4.0, 3.0, 3.0, 4.0, 5.0],
+        "Number of Reviews": [10, 10, 10, 10, 10, 10, 10],
+        "Price": [300.0, 300.0, 800.0, 300.0, 300.0, 300.0, 100.0],
+        "Listening Time": [600.0, 600.0, 600.0, 600.0, 120.0, 600.0, 600.0],
+    })
+    # Orthogonal embeddings: only a shared author or series makes two picks redundant
+    return Reranker(df, embeddings=np.eye(len(df), dtype=np.float32))
+
+
+@pytest.mark.parametrize("title, series", [
+    ("Killing Floor: Jack Reacher, Book 1", "jack reacher"),
+    ("The Fellowship (The Lord of the Rings, Book 1)", "the lord of the rings"),
+    ("Harry Potter and the Goblet of Fire, Book 4", ""),
+    ("Dune", ""),
+])
+def test_series_name(title, series):
+    assert series_name(title) == series
+
+
+def test_reranker_scripts_and_lazy_embeddings():
+    df = pd.DataFrame({
+        "Book Name": ["Dune", "गोदान", "1984", "Emma"],
+        "Author": ["Frank Herbert", "Premchand", "George Orwell", "Jane Austen"],
+        "Rating": [4.5, 4.0, 4.6, 4.1],
+        "Number of Reviews": [100, 10, 200, 50],
+        "Price": [500.0, 200.0, 300.0, 250.0],
+        "Listening Time": [1200.0, 600.0, 700.0, 900.0],
+    })
+    loads = []
+    reranker = Reranker(df, loader=lambda: loads.append(1))
+    assert list(reranker.scripts) == ["Latin", "Devanagari"]
+    assert reranker.script_codes[2] == -1
+    assert not loads
+    reranker.rerank(0, [1, 2, 3], [0.9, 0.8, 0.7], top_n=2)
+    assert loads == [1]
+
+
+def test_rerank_filters_candidates(reranker):
+    rows, scores = reranker.rerank(0, [1, 2, 3, 4, 6], [0.9, 0.8, 0.7, 0.6, 0.5], top_n=5, diversity=0,
+                                   prior_weight=0, max_price=500, min_rating=3.5, min_minutes=300)
+    # 2 is too expensive, 3 rated too low, 4 too short
+    assert rows.tolist() == [1, 6]
+    np.testing.assert_allclose(scores, [0.9, 0.5])
+
+
+def test_rerank_drops_other_listings_of_the_query_title(reranker):
+    rows, _ = reranker.rerank(0, [5, 1, 4], [0.99, 0.9, 0.6], top_n=3, diversity=0, prior_weight=0)
+    assert rows.tolist() == [1, 4]
+
+
+def test_mmr_penalises_same_series_and_author(reranker):
+    candidates, scores = [1, 2, 3, 4], [0.9, 0.85, 0.8, 0.7]
+    rows, _ = reranker.rerank(0, candidates, scores, top_n=3, diversity=0, prior_weight=0)
+    assert rows.tolist() == [1, 2, 3]
+
+    # After 1, its series mate 2 drops to 0.85 - 0.3 and its author mate 3 to 0.8 - 0.3, below 4's 0.7
+    rows, relevance = reranker.rerank(0, candidates, scores, top_n=3, diversity=0.3, prior_weight=0)
+    assert rows.tolist() == [1, 4, 2]
+    np.testing.assert_allclose(relevance, [0.9, 0.7, 0.85])
+
+
+def test_prior_breaks_similarity_ties(reranker):
+    rows, relevance = reranker.rerank(0, [4, 1, 6], [0.5, 0.5, 0.5], top_n=3, diversity=0, prior_weight=0.1)
+    assert rows.tolist() == [6, 1, 4]
+    np.testing.assert_allclose(relevance, 0.5 + 0.1 * reranker.prior[[6, 1, 4]])
+
+
+def test_rating_prior_shrinks_towards_the_mean():
+    prior = rating_prior([5.0, 3.0, -1.0], [10, 10, 0])
+    # Ten reviews against a confidence of ten pull each rating halfway to the mean of 4
+    np.testing.assert_allclose(prior, [4.5 / 5, 3.5 / 5, 4.0 / 5])
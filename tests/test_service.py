@@ -0,0 +1,110 @@
+import asyncio
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import RecommendationEngine
+from neighbor_index import NeighborIndex
+from service import MAX_TOP_N, LocalClient, RecommendationService
+from similarity import CATALOG_PATH
+
+K = 20
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """Engine over the real catalog with random top-K lists, so no models are needed."""
+    df = pd.read_csv(CATALOG_PATH)
+    rng = np.random.default_rng(0)
+    indices = rng.integers(0, len(df), size=(len(df), K)).astype(np.int32)
+    scores = -np.sort(-rng.random((len(df), K)).astype(np.float32), axis=1)
+    return RecommendationEngine(df, NeighborIndex(indices, scores))
+
+
+def call(service, *requests):
+    """Run (method, target, payload) requests concurrently through a `LocalClient`."""
+    client = LocalClient(service)
+
+    async def run():
+        return await asyncio.gather(*(client.request(*request) for request in requests))
+
+    try:
+        return asyncio.run(run())
+    finally:
+        service.close()
+
+
+def test_health(engine):
+    [(status, body)] = call(RecommendationService(engine), ("GET", "/health"))
+    assert status == 200
+    assert body["status"] == "ok"
+    assert body["books"] == len(engine)
+
+
+def test_title_returns_index_neighbors(engine):
+    title = engine.df["Book Name"].iloc[0]
+    [(status, body)] = call(RecommendationService(engine), ("GET", f"/recommend/title?q={quote(title)}&top_n=3"))
+    assert status == 200
+    assert body["query"] == title
+    assert body["match"]["Book Name"] == title
+    expected, _ = engine.neighbor_index.neighbors(body["match"]["row"], 3)
+    assert [record["row"] for record in body["results"]] == expected.tolist()
+
+
+def test_genre_and_batch(engine):
+    title = engine.df["Book Name"].iloc[1]
+    (genre_status, genre_body), (batch_status, batch_body) = call(
+        RecommendationService(engine),
+        ("GET", "/recommend/genre?genre=Thriller&top_n=4"),
+        ("POST", "/recommend/batch", {"titles": [title, "no such book at all"], "genres": ["romance"], "top_n": 2}),
+    )
+    assert genre_status == 200
+    assert genre_body["genre"] == "Thriller"
+    assert [record["row"] for record in genre_body["results"]] == \
+        engine.genre_index.query("Thriller", top_n=4).tolist()
+    assert batch_status == 200
+    assert [entry["query"] for entry in batch_body["titles"]] == [title, "no such book at all"]
+    assert len(batch_body["titles"][0]["results"]) == 2
+    assert batch_body["titles"][1]["match"] is None
+    assert batch_body["genres"][0]["genre"] == "romance"
+
+
+@pytest.mark.parametrize("method, target, payload, status", [
+    ("GET", "/recommend/title", None, 400),
+    ("GET", "/recommend/title?q=dune&top_n=0", None, 400),
+    ("GET", f"/recommend/title?q=dune&top_n={MAX_TOP_N + 1}", None, 400),
+    ("GET", "/recommend/title?q=dune&top_n=five", None, 400),
+    ("GET", "/recommend/genre?genre=drama&mode=some", None, 400),
+    ("POST", "/recommend/batch", "not an object", 400),
+    ("POST", "/recommend/batch", {"titles": [1, 2]}, 400),
+    ("GET", "/recommend/everything", None, 404),
+    ("POST", "/recommend/title?q=dune", {}, 405),
+    ("GET", "/recommend/batch", None, 405),
+])
+def test_errors(engine, method, target, payload, status):
+    [(response_status, body)] = call(RecommendationService(engine), (method, target, payload))
+    assert response_status == status
+    assert "error" in body
+
+
+def test_title_without_neighbor_index_is_unavailable(engine):
+    service = RecommendationService(RecommendationEngine(engine.df, None))
+    [(status, body)] = call(service, ("GET", "/recommend/title?q=dune"))
+    assert status == 503
+    assert "error" in body
+
+
+def test_identical_requests_are_coalesced_per_caller(engine):
+    title = engine.df["Book Name"].iloc[2]
+    service = RecommendationService(engine)
+    (_, first), (_, second) = call(
+        service,
+        ("GET", f"/recommend/title?q={quote(title)}"),
+        ("GET", f"/recommend/title?q={quote(title.upper())}"),
+    )
+    assert service.coalesced == 1
+    assert first["query"] == title
+    assert second["query"] == title.upper()
+    assert first["results"] == second["results"]
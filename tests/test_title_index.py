@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from similarity import CATALOG_PATH
+from title_index import MATCH_KINDS, TitleIndex, normalize_title, trigrams
+
+
+def reference_search(titles, query, limit=5, min_similarity=0.3):
+    """Brute force over every title: best kind first, then trigram similarity, then row."""
+    name = normalize_title(query)
+    if not name:
+        return []
+    query_grams = trigrams(name)
+    ranked = []
+    for row, title in enumerate(titles):
+        normalized = normalize_title(title)
+        grams = trigrams(normalized)
+        similarity = 2.0 * len(query_grams & grams) / (len(query_grams) + len(grams))
+        if normalized == name:
+            kind = "exact"
+        elif normalized.startswith(name):
+            kind = "prefix"
+        elif name in normalized:
+            kind = "contains"
+        elif similarity >= min_similarity:
+            kind = "fuzzy"
+        else:
+            continue
+        ranked.append((-MATCH_KINDS[kind], -similarity, row, kind))
+    return [(row, kind) for _, _, row, kind in sorted(ranked)[:limit]]
+
+
+def search(index, query, **kwargs):
+    return [(match.row, match.kind) for match in index.search(query, **kwargs)]
+
+
+TITLES = ["Dune", "Dune Messiah", "Children of Dune", "Dunes of Arrakis", "Les Misérables", "LES MISERABLES",
+          "The Hobbit", "Hobbit Tales", "A", "Ab Initio"]
+
+
+@pytest.fixture(scope="module")
+def small():
+    return TitleIndex(TITLES)
+
+
+def test_kinds_rank_exact_prefix_contains_fuzzy(small):
+    assert search(small, "dune") == [(0, "exact"), (1, "prefix"), (3, "prefix"), (2, "contains")]
+    assert search(small, "dnue messiah")[0] == (1, "fuzzy")
+
+
+def test_case_and_accents_fold(small):
+    assert search(small, "les miserables") == [(4, "exact"), (5, "exact")]
+    assert search(small, "  LES   Misérables ") == [(4, "exact"), (5, "exact")]
+
+
+def test_short_queries_match_substrings(small):
+    assert search(small, "a")[:2] == [(8, "exact"), (9, "prefix")]
+    assert search(small, "a", limit=10) == reference_search(TITLES, "a", limit=10)
+    assert (2, "contains") in search(small, "dr", limit=10)
+    assert search(small, "zq") == []
+
+
+def test_empty_query_and_index():
+    assert TitleIndex(TITLES).search("   ") == []
+    assert TitleIndex([]).search("dune") == []
+
+
+def test_limit_is_respected(small):
+    assert len(small.search("dune", limit=2)) == 2
+
+
+@pytest.fixture(scope="module")
+def catalog_titles():
+    return pd.read_csv(CATALOG_PATH)["Book Name"].astype(str).tolist()
+
+
+def test_matches_brute_force_on_catalog(catalog_titles):
+    index = TitleIndex(catalog_titles)
+    rng = np.random.default_rng(0)
+    queries = ["harry potter", "the", "a", "xq", "atomic habits", "harry pottre", "1984", "é"]
+    for row, start, length in zip(rng.integers(0, len(catalog_titles), 60), rng.integers(0, 6, 60),
+                                  rng.integers(1, 14, 60)):
+        queries.append(catalog_titles[row][start:start + length])
+    for query in queries:
+        assert search(index, query, limit=8) == reference_search(catalog_titles, query, limit=8), query
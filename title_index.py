@@ -0,0 +1,204 @@
+import bisect
+import unicodedata
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+TitleMatch = namedtuple("TitleMatch", ["row", "title", "kind", "score"])
+
+# Candidates are ranked by match kind first, then by trigram similarity
+MATCH_KINDS = {"exact": 3, "prefix": 2, "contains": 1, "fuzzy": 0}
+
+# A trigram is packed into one int64: three 21-bit Unicode code points
+CODE_BITS = 21
+CODE_MASK = (1 << CODE_BITS) - 1
+
+# 1-2 character queries are too short for trigrams; their substring matches are cached
+SHORT_QUERY_CACHE = 4096
+
+
+def normalize_title(title):
+    """Casefold, strip accents and collapse whitespace."""
+    text = str(title).casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+def trigrams(text, padded=True):
+    if padded:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def gram_code(gram):
+    return (ord(gram[0]) << 2 * CODE_BITS) | (ord(gram[1]) << CODE_BITS) | ord(gram[2])
+
+
+class TitleIndex:
+    """Title lookup built once at load: exact hash, sorted prefix list and trigram postings.
+
+    Postings are stored CSR-style: sorted trigram codes, offsets and the
+    sorted rows of each trigram. No per-query work is proportional to the
+    catalog size; it follows the postings of the query's trigrams.
+    """
+
+    def __init__(self, titles):
+        self.titles = [str(title) for title in titles]
+        self.normalized = [normalize_title(title) for title in self.titles]
+
+        self.exact = defaultdict(list)
+        for row, name in enumerate(self.normalized):
+            self.exact[name].append(row)
+        self._build_postings()
+
+        order = sorted(range(len(self.normalized)), key=lambda row: self.normalized[row])
+        self.sorted_names = [self.normalized[row] for row in order]
+        self.sorted_rows = np.array(order, dtype=np.int32)
+        self._short_rows = lru_cache(maxsize=SHORT_QUERY_CACHE)(self._find_short_rows)
+
+    def _build_postings(self):
+        # Every padded title's code points in one array; a trigram is valid when it stays within one title
+        padded = [f"  {name} " for name in self.normalized]
+        lengths = np.array([len(text) for text in padded], dtype=np.int64)
+        points = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        owners = np.repeat(np.arange(len(padded), dtype=np.int32), lengths)
+        codes = (points[:-2] << 2 * CODE_BITS) | (points[1:-1] << CODE_BITS) | points[2:]
+        valid = owners[:-2] == owners[2:]
+        codes, rows = codes[valid], owners[:-2][valid]
+
+        # Number trigrams by code order (hash factorize, then sort only the distinct codes) and sort
+        # (trigram, row) pairs as one packed int64, dropping repeats of a trigram within one title
+        ids, uniques = pd.factorize(codes)
+        order = np.argsort(uniques)
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+        pairs = np.sort(ranks[ids] * len(padded) + rows)
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] != pairs[:-1]
+        pairs = pairs[first]
+        codes, rows = uniques[order][pairs // len(padded)], (pairs % len(padded)).astype(np.int32)
+
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+        self.gram_keys = codes[starts]
+        self.gram_offsets = np.r_[starts, len(codes)].astype(np.int64)
+        self.posting_rows = rows
+        self.gram_counts = np.bincount(rows, minlength=len(self.titles)).astype(np.int32)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _postings(self, gram):
+        code = gram_code(gram)
+        i = np.searchsorted(self.gram_keys, code)
+        if i == len(self.gram_keys) or self.gram_keys[i] != code:
+            return None
+        return self.posting_rows[self.gram_offsets[i]:self.gram_offsets[i + 1]]
+
+    def _prefix_rows(self, name):
+        start = bisect.bisect_left(self.sorted_names, name)
+        stop = bisect.bisect_left(self.sorted_names, name + "\U0010ffff", lo=start)
+        return self.sorted_rows[start:stop]
+
+    def _hits(self, rows, postings):
+        """How many of the query's trigram `postings` each of the sorted `rows` appears in."""
+        # A binary search per row and gram costs ~16 steps; counting every posting once costs their total length
+        if 16 * len(rows) * len(postings) > sum(map(len, postings)) + len(self):
+            return np.bincount(np.concatenate(postings), minlength=len(self))[rows]
+        hits = np.zeros(len(rows), dtype=np.int64)
+        for gram_rows in postings:
+            hits += contains_sorted(gram_rows, rows)
+        return hits
+
+    def _gram_hits(self, postings):
+        """(sorted rows, hits) for every row that shares at least one trigram with the query."""
+        if not postings:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        combined = np.sort(np.concatenate(postings))
+        starts = np.flatnonzero(np.r_[True, combined[1:] != combined[:-1]])
+        return combined[starts], np.diff(np.r_[starts, len(combined)])
+
+    def _contains_rows(self, name, inner):
+        """Sorted rows whose title contains `name`, intersecting its inner trigrams' postings rarest first."""
+        if not inner:
+            return self._short_rows(name)
+        lists = [self._postings(gram) for gram in inner]
+        if any(gram_rows is None for gram_rows in lists):
+            return np.zeros(0, dtype=np.int32)
+        lists.sort(key=len)
+        rows = lists[0]
+        for gram_rows in lists[1:]:
+            rows = rows[contains_sorted(gram_rows, rows)]
+        if len(inner) > 1:
+            # Sharing every trigram does not guarantee the grams are contiguous
+            rows = np.array([row for row in rows if name in self.normalized[row]], dtype=np.int32)
+        return rows
+
+    def _find_short_rows(self, name):
+        """Sorted rows whose title contains a 1-2 character `name`, from the trigrams containing it."""
+        keys = self.gram_keys
+        points = [(keys >> shift) & CODE_MASK for shift in (2 * CODE_BITS, CODE_BITS, 0)]
+        wanted = [ord(char) for char in name]
+        match = np.zeros(len(keys), dtype=bool)
+        for start in range(4 - len(wanted)):
+            match |= np.logical_and.reduce([points[start + i] == code for i, code in enumerate(wanted)])
+        selected = np.repeat(match, np.diff(self.gram_offsets))
+        return np.unique(self.posting_rows[selected])
+
+    def search(self, query, limit=5, min_similarity=0.3):
+        """Return up to `limit` ranked `TitleMatch` candidates for `query`.
+
+        Kinds are filled best first (exact, prefix, contains, fuzzy) and a
+        kind is only scored when the better ones leave room, so a query
+        touches the rows of its postings rather than the whole catalog.
+        """
+        name = normalize_title(query)
+        if not name:
+            return []
+
+        # Padded grams give the fuzzy score, inner (unpadded) grams decide containment
+        inner = trigrams(name, padded=False)
+        query_grams = trigrams(name)
+        postings = [gram_rows for gram_rows in map(self._postings, query_grams) if gram_rows is not None]
+        tiers = {
+            "exact": lambda: np.array(self.exact.get(name, []), dtype=np.int32),
+            "prefix": lambda: np.sort(self._prefix_rows(name)),
+            "contains": lambda: self._contains_rows(name, inner),
+        }
+
+        matches = []
+        seen = np.zeros(0, dtype=np.int32)
+        for kind in ["exact", "prefix", "contains", "fuzzy"]:
+            if kind == "fuzzy":
+                rows, hits = self._gram_hits(postings)
+                keep = ~contains_sorted(seen, rows)
+                rows, hits = rows[keep], hits[keep]
+            else:
+                rows = np.setdiff1d(tiers[kind](), seen, assume_unique=True)
+                hits = self._hits(rows, postings)
+            similarity = 2.0 * hits / (len(query_grams) + self.gram_counts[rows])
+            if kind == "fuzzy":
+                rows, similarity = rows[similarity >= min_similarity], similarity[similarity >= min_similarity]
+            wanted = limit - len(matches)
+            if len(rows) > wanted:
+                # Only rows scoring at least the wanted-th best can be picked; ties are broken by row below
+                cutoff = np.partition(similarity, len(similarity) - wanted)[len(similarity) - wanted]
+                best = similarity >= cutoff
+                rows, similarity = rows[best], similarity[best]
+            for i in np.lexsort((rows, -similarity))[:wanted]:
+                matches.append(TitleMatch(int(rows[i]), self.titles[rows[i]], kind, float(similarity[i])))
+            if len(matches) >= limit:
+                break
+            seen = np.union1d(seen, rows)
+        return matches
+
+
+def contains_sorted(sorted_rows, rows):
+    """Boolean mask of which `rows` are in the sorted array `sorted_rows`."""
+    if len(sorted_rows) == 0:
+        return np.zeros(len(rows), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_rows, rows), len(sorted_rows) - 1)
+    return sorted_rows[positions] == rows